@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark harness for the EV charging atlas pipeline.
+Times each stage (normalise_ocm_tables, enrich_dataframe, route_points_json, planner_nodes, build_map, postprocess_outputs,
+and the boundary spatial join against synthetic polygons) on synthetic OCM payloads, records peak memory and output sizes, and appends the results to a JSON
+history so regressions show up between versions.
+
+Usage:
+    python bench_ev_atlas.py --sizes 1000,10000,50000
+    python bench_ev_atlas.py --sizes 500000 --stages normalise,enrich,route_js
+    python bench_ev_atlas.py --sizes 100000 --stages spatial_index,spatial_join --areas 5000
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import dataclasses
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Dict, Any, Callable
+
+import build_ev_atlas as atlas
+from synthetic_ocm import generate_pois, generate_boundaries
+
+# ============================================================
+# 1) CONFIGURATION
+# ============================================================
+HISTORY_JSON = Path("data/bench/bench_history.json")
+DEFAULT_SIZES = "1000,10000,50000"
+STAGES = ["normalise", "enrich", "route_js", "planner_nodes", "build_map", "postprocess", "spatial_index", "spatial_join"]
+DEFAULT_AREAS = 2000  # synthetic boundary polygons for the spatial join stages
+REGRESSION_PCT = 20.0  # flag stages slower (or larger) than the previous run by more than this
+
+# ============================================================
+# 2) Measurement helpers
+# ============================================================
+def git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+def time_call(fn: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    """Best-of-`repeat` wall time in seconds, plus the last result."""
+    best, result = float("inf"), None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def peak_memory(fn: Callable[[], Any]) -> int:
+    """Peak bytes allocated by Python (incl. numpy buffers) while `fn` runs."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+# ============================================================
+# 3) Pipeline run
+# ============================================================
+def bench_size(n: int, stages: List[str], repeat: int, track_memory: bool, workdir: Path,
+               n_areas: int = DEFAULT_AREAS) -> Dict[str, Any]:
+    print(f">> Generating {n:,} synthetic POIs...")
+    t0 = time.perf_counter()
+    pois = generate_pois(n)
+    gen_s = time.perf_counter() - t0
+
+    region = dataclasses.replace(atlas.REGIONS[atlas.DEFAULT_REGION], key=f"bench_{n}",
+                                 output_html=workdir / f"bench_{n}" / "index.html",
+                                 snapshot_csv=workdir / f"bench_{n}" / "snapshot.csv")
+    region.output_html.parent.mkdir(parents=True, exist_ok=True)
+    layer = atlas.BoundaryLayer("lga", workdir / f"boundaries_{n_areas}.geojson", "LGA_CODE24", "LGA_NAME24", "population")
+    region = dataclasses.replace(region, boundaries=(layer,))
+    if {"spatial_index", "spatial_join"} & set(stages) and not layer.path.exists():
+        with open(layer.path, "w", encoding="utf-8") as fh:
+            json.dump(generate_boundaries(n_areas), fh)
+
+    # Later stages need the frames from earlier ones even when those are not being measured.
+    state: Dict[str, Any] = dict(zip(("raw", "conns"), atlas.normalise_ocm_tables(pois)))
+    state["df"] = atlas.enrich_dataframe(state["raw"], region)
+
+    def run_normalise(): return atlas.normalise_ocm_tables(pois)
+    def run_enrich(): return atlas.enrich_dataframe(state["raw"], region)
+    def run_route_js(): return atlas.route_points_json(state["df"])
+    def run_planner_nodes(): return atlas.planner_nodes(state["df"])
+    def run_build_map(): return atlas.build_map(state["df"], "bench", "bench", region, state["conns"])
+    def run_postprocess(): return atlas.postprocess_outputs([region.output_html])
+    def run_spatial_index(): return atlas.build_polygon_index(state["features"], layer)
+    def run_spatial_join(): return atlas.join_boundaries(state["df"], region)
+    runners = {"normalise": run_normalise, "enrich": run_enrich, "route_js": run_route_js, "planner_nodes": run_planner_nodes,
+               "build_map": run_build_map, "postprocess": run_postprocess,
+               "spatial_index": run_spatial_index, "spatial_join": run_spatial_join}
+    if layer.path.exists():
+        state["features"] = atlas.read_boundary_features(layer)
+        atlas._BOUNDARY_INDEXES[layer.path] = run_spatial_index()
+
+    result: Dict[str, Any] = {"n_pois": n, "n_sites": int(len(state["df"])), "n_connections": int(len(state["conns"])),
+                              "generate_s": round(gen_s, 4), "stages": {}}
+    for name in STAGES:
+        if name not in stages:
+            continue
+        if name == "postprocess" and not region.output_html.exists():
+            run_build_map()
+        print(f">> [{n:,}] {name}...")
+        secs, out = time_call(runners[name], repeat if name != "postprocess" else 1)
+        row: Dict[str, Any] = {"seconds": round(secs, 4)}
+        if track_memory and name != "postprocess":
+            row["peak_mb"] = round(peak_memory(runners[name]) / 2**20, 2)
+        if name == "route_js":
+            row["bytes"] = len(out.encode("utf-8"))
+        if name == "planner_nodes":
+            row.update({"nodes": out["n"], "bytes": len(json.dumps(out))})
+        if name == "build_map":
+            row["html_bytes"] = region.output_html.stat().st_size
+        if name == "postprocess" and out:
+            row.update({k: out[0][k] for k in ("minified", "gz", "br")})
+        if name == "spatial_index":
+            row.update({"areas": len(out.keys), "edges": len(out.edges), "cell_edges": len(out.cell_edges)})
+        if name == "spatial_join":
+            row["matched"] = int(out["area_lga"].notna().sum())
+        result["stages"][name] = row
+    return result
+
+# ============================================================
+# 4) History
+# ============================================================
+def load_history(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+def compare_to_previous(run: Dict[str, Any], history: List[Dict[str, Any]]):
+    if not history:
+        print(">> No previous benchmark run to compare against.")
+        return
+    prev = history[-1]
+    prev_by_n = {r["n_pois"]: r for r in prev.get("results", [])}
+    print(f">> Compared with {prev.get('version')} @ {prev.get('revision')} ({prev.get('timestamp')}):")
+    for res in run["results"]:
+        old = prev_by_n.get(res["n_pois"])
+        if not old:
+            continue
+        for stage, row in res["stages"].items():
+            old_row = old["stages"].get(stage)
+            if not old_row:
+                continue
+            for metric in ("seconds", "peak_mb", "html_bytes", "bytes"):
+                if metric not in row or not old_row.get(metric):
+                    continue
+                change = 100.0 * (row[metric] - old_row[metric]) / old_row[metric]
+                flag = "  !! regression" if change > REGRESSION_PCT else ""
+                print(f"   {res['n_pois']:>8,} {stage:<14} {metric:<10} {old_row[metric]:>12} -> {row[metric]:>12} ({change:+.0f}%){flag}")
+
+# ============================================================
+# 5) Main
+# ============================================================
+def main(argv: List[str] | None = None):
+    ap = argparse.ArgumentParser(description="Benchmark the EV atlas pipeline on synthetic OCM payloads.")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated POI counts (default: {DEFAULT_SIZES})")
+    ap.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of: {', '.join(STAGES)}")
+    ap.add_argument("--areas", type=int, default=DEFAULT_AREAS, help=f"synthetic boundary polygons (default: {DEFAULT_AREAS})")
+    ap.add_argument("--repeat", type=int, default=1, help="timing repeats per stage; best is kept")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass for peak memory")
+    ap.add_argument("--history", type=Path, default=HISTORY_JSON)
+    ap.add_argument("--no-save", action="store_true", help="do not append this run to the history file")
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(f"!! Unknown stage(s): {', '.join(unknown)}")
+        sys.exit(2)
+
+    run: Dict[str, Any] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "version": atlas.ATLAS_VERSION,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="ev_atlas_bench_") as tmp:
+        for n in sizes:
+            run["results"].append(bench_size(n, stages, args.repeat, not args.no_memory, Path(tmp), args.areas))
+
+    for res in run["results"]:
+        print(f">> {res['n_pois']:,} POIs ({res['n_sites']:,} sites):")
+        for stage, row in res["stages"].items():
+            print(f"   {stage:<14} " + "  ".join(f"{k}={v}" for k, v in row.items()))
+
+    history = load_history(args.history)
+    compare_to_previous(run, history)
+    if not args.no_save:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        history.append(run)
+        with open(args.history, "w", encoding="utf-8") as fh:
+            json.dump(history, fh, indent=2)
+        print(f">> Appended results to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
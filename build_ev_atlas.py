@@ -10,31 +10,62 @@ Changes in v6:
 - Snapshot includes per-state counts (state abbreviations).
 - Snapshot status lines include colored dots matching legend.
 - Added clear knobs to control the route panel position; default stays top-right under Layer Control.
+
+Changes in v7:
+- Region configs (AU, NZ, per-state drill-downs) replace the single hard-wired Australian map.
+- One invocation fetches each country once and builds every requested region in a process pool;
+  state maps are cut from the shared national frame.
+- Output HTML is minified and written with .gz/.br precompressed siblings, with a size report.
+- CLI subcommands (fetch, snapshot, build-map, all); pandas/numpy load only for data stages and
+  folium/branca only for map rendering, so data-only refreshes start fast on small runners.
+- Faceted filter panel (operator, connector, minimum kW, status, usage) backed by per-facet bitsets
+  precomputed at build time; replaces the duplicated public/private/fast/all-points marker layers.
+- Long-format connection table (one row per OCM connection) kept next to the site table, with
+  vectorised port aggregations feeding the snapshot box, popups and stats.json.
+- OCM requests negotiate gzip and are conditional (ETag/Last-Modified); the compressed response is
+  cached on disk per query, and --offline rebuilds from that cache without network access.
+- Range-aware charging-stop planner: the build precomputes a deduplicated table of public fast sites,
+  and the route panel searches the stops in its route corridor for a fewest-stops or least-detour plan.
+- Spatial join against local state/LGA/postcode boundary files (grid-indexed, vectorised ray casting):
+  polygon states replace the free-text OCM state, per-area tables (sites, ports, kW, sites per
+  capita) are written next to each map, and an optional choropleth layer is added.
 """
 
 from __future__ import annotations
 
 import os
+import re
+import sys
+import gzip
+import html
+import base64
+import hashlib
 import json
 import math
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 
 import requests
-import pandas as pd
-import numpy as np
 
 from dotenv import load_dotenv
 
-import folium
-from folium import Map, TileLayer, FeatureGroup, LayerControl, CircleMarker
-from folium.plugins import MarkerCluster, HeatMap
-from branca.element import MacroElement, Template, Figure
+# pandas/numpy and folium/branca are imported inside the stages that use them (see `main`).
+if TYPE_CHECKING:
+    import pandas as pd
+    from folium import Map, CircleMarker
+    from branca.element import MacroElement
 
 # ============================================================
 # 1) CONFIGURATION
 # ============================================================
+ATLAS_VERSION = "v7"
+
 OCM_URL = "https://api.openchargemap.io/v3/poi/"
 COUNTRY_CODE = "AU"
 MAXRESULTS = 10000
@@ -46,6 +77,7 @@ ROUTE_PROXIMITY_KM = 5.0
 ROUTE_LINE_WEIGHT = 2.0  # thinner than before (was 5)
 
 OUTPUT_HTML = Path("outputs/index.html")
+OCM_CACHE_DIR = Path("data/raw/ocm_cache")  # gzip'd raw responses + validators, one pair per query
 BACKUP_CSV = Path("data/processed/ocm_australia_backup.csv")
 LATEST_SNAPSHOT_CSV = Path("data/processed/ocm_australia_latest.csv")
 
@@ -63,7 +95,6 @@ THIRD_TITLE_PLACEHOLDER = "Swinburne University of Technology. Data snapshot fro
 HOWTO_FAST_LINE = f"Fast chargers are defined here as sites with ≥ {int(FAST_KW)} kW."
 
 COL_STATUS = {"operational":"#16a34a","partial":"#f59e0b","down":"#ef4444","unknown":"#6b7280"}
-COL_FAST = "#2563eb"
 COL_PUBLIC = "#10b981"
 COL_PRIVATE = "#8b5cf6"
 
@@ -74,10 +105,179 @@ ROUTE_PANEL_AUTO = False
 ROUTE_PANEL_TOP_PX = 210
 ROUTE_PANEL_RIGHT_PX = 10
 
+# Charging-stop planner: public, working fast sites are the candidate stops (the most powerful one per
+# PLANNER_CELL_KM grid cell). Stops must lie within PLANNER_CORRIDOR_KM of the route; legs are measured
+# along the route plus the detour at each end, may use at most (1 - PLANNER_RESERVE) of the range, and
+# stop-to-stop legs are capped at PLANNER_MAX_LEG_KM.
+PLANNER_MAX_LEG_KM = 500.0
+PLANNER_CELL_KM = 5.0
+PLANNER_CORRIDOR_KM = 10.0
+PLANNER_RESERVE = 0.10
+PLANNER_KW_OPTIONS = [50, 75, 150, 250]
+
+# Filter panel facets: operators beyond the top N are grouped as "Other operators";
+# power buckets are cumulative ("≥ X kW").
+FACET_MAX_OPERATORS = 30
+FACET_KW_BUCKETS = [7, 22, 50, 150, 350]
+FILTER_PANEL_TOP_PX = 110
+FILTER_PANEL_LEFT_PX = 10
+
+# Boundary files for the spatial join (GeoJSON, EPSG:4326), see AU_BOUNDARIES. Missing files are skipped.
+# The grid index has SPATIAL_GRID_SIZE x SPATIAL_GRID_SIZE cells over each layer's extent; point/edge
+# tests run in batches of at most SPATIAL_JOIN_CHUNK pairs.
+BOUNDARIES_DIR = Path("data/boundaries")
+SPATIAL_GRID_SIZE = 256
+SPATIAL_JOIN_CHUNK = 4_000_000
+
+# Choropleth layer (hidden by default in the layer control): boundary level to shade, or None for no layer.
+# Shaded by sites per 100k residents when the layer has population, else by site count.
+CHOROPLETH_LEVEL: Optional[str] = "state"
+CHOROPLETH_PRECISION = 3  # decimal places kept in embedded polygon coordinates (~100 m)
+CHOROPLETH_COLORS = ["#f7fbff", "#c6dbef", "#6baed6", "#2171b5", "#08306b"]
+
+# Connector types listed (by port count) in the snapshot box
+SNAPSHOT_TOP_CONNECTORS = 4
+
+# Output post-processing: minify HTML/CSS/JS and write .gz/.br siblings next to every output asset.
+# Brotli output needs the optional `brotli` package; without it only .gz files are written.
+MINIFY_OUTPUTS = True
+PRECOMPRESS_OUTPUTS = True
+BROTLI_QUALITY = 9  # 11 squeezes a few % more but is ~50x slower on multi-MB pages
+
+# ============================================================
+# 1b) Regions
+# ============================================================
+# State normalisation for per-state counts
+STATE_MAP = {
+    "new south wales": "NSW", "nsw": "NSW",
+    "victoria": "VIC", "vic": "VIC",
+    "queensland": "QLD", "qld": "QLD",
+    "south australia": "SA", "sa": "SA",
+    "western australia": "WA", "wa": "WA",
+    "tasmania": "TAS", "tas": "TAS",
+    "northern territory": "NT", "nt": "NT",
+    "australian capital territory": "ACT", "act": "ACT",
+}
+ORDER_STATES = ["NSW","VIC","QLD","WA","SA","TAS","ACT","NT"]
+
+NZ_REGION_MAP = {
+    "northland": "NTL", "auckland": "AUK", "waikato": "WKO", "bay of plenty": "BOP",
+    "gisborne": "GIS", "hawke's bay": "HKB", "hawkes bay": "HKB", "taranaki": "TKI",
+    "manawatu-wanganui": "MWT", "manawatū-whanganui": "MWT", "manawatu-whanganui": "MWT",
+    "wellington": "WGN", "tasman": "TAS", "nelson": "NSN", "marlborough": "MBH",
+    "west coast": "WTC", "canterbury": "CAN", "otago": "OTA", "southland": "STL",
+}
+ORDER_NZ_REGIONS = ["AUK","WGN","CAN","WKO","BOP","OTA","NTL","HKB","MWT","TKI",
+                    "NSN","TAS","MBH","GIS","WTC","STL"]
+
+@dataclass(frozen=True)
+class BoundaryLayer:
+    """A polygon layer joined onto sites; each site gets an `area_<level>` column with the area key."""
+    level: str                      # "state", "lga" or "postcode"
+    path: Path
+    code_field: str                 # feature property holding the area code
+    name_field: str
+    population_field: Optional[str] = None   # residents, for per-capita rates
+
+# ABS ASGS digital boundaries (GDA2020 -> WGS84 GeoJSON, simplified), with a `population` property
+# added from the matching census table. State areas are keyed by abbreviation (NSW, VIC, ...).
+AU_BOUNDARIES = (
+    BoundaryLayer("state", BOUNDARIES_DIR / "au_states.geojson", "STE_CODE21", "STE_NAME21", "population"),
+    BoundaryLayer("lga", BOUNDARIES_DIR / "au_lga.geojson", "LGA_CODE24", "LGA_NAME24", "population"),
+    BoundaryLayer("postcode", BOUNDARIES_DIR / "au_postcodes.geojson", "POA_CODE21", "POA_NAME21", "population"),
+)
+AREA_LEVELS = ("state", "lga", "postcode")
+
+@dataclass(frozen=True)
+class Region:
+    """One map to build. Regions with a `parent` are cut from the parent's frame instead of fetched."""
+    key: str
+    name: str                       # used in the snapshot heading, e.g. "Australian EV charging snapshot"
+    country_code: str
+    country_name: str
+    map_start: Dict[str, float]
+    bounds: List[List[float]]       # SW to NE corners
+    output_html: Path
+    snapshot_csv: Path
+    backup_csv: Optional[Path] = None
+    parent: Optional[str] = None
+    states: tuple = ()              # state_abbrev values kept when cut from the parent
+    fit_bounds: bool = False
+    title: str = TITLE_PLACEHOLDER
+    subtitle: str = SUBTITLE_PLACEHOLDER
+    route_examples: tuple = ("101 Collins Street, Melbourne", "601 Hay Street, Perth")
+    state_map: Dict[str, str] = field(default_factory=lambda: dict(STATE_MAP))
+    order_states: List[str] = field(default_factory=lambda: list(ORDER_STATES))
+    boundaries: tuple = ()          # BoundaryLayer entries for the spatial join
+
+    @property
+    def stats_json(self) -> Path:
+        return self.output_html.parent / "stats.json"
+
+    @property
+    def connections_csv(self) -> Path:
+        return self.snapshot_csv.with_name(self.snapshot_csv.stem + "_connections.csv")
+
+    @property
+    def source(self) -> str:
+        """Key of the region whose data this region is built from."""
+        return self.parent or self.key
+
+    def area_csv(self, level: str) -> Path:
+        return self.output_html.parent / f"areas_{level}.csv"
+
+def _state_region(key: str, name: str, lat: float, lon: float, zoom: int, bounds) -> Region:
+    abbr = key.upper()
+    return Region(
+        key=key, name=name, country_code=COUNTRY_CODE, country_name="Australia", parent="au", states=(abbr,),
+        map_start={"lat": lat, "lon": lon, "zoom": zoom}, bounds=bounds, fit_bounds=True,
+        output_html=Path(f"outputs/{key}/index.html"),
+        snapshot_csv=Path(f"data/processed/ocm_australia_{key}_latest.csv"),
+        title=f"{name} EV Infrastructure Monitor",
+        order_states=[abbr], boundaries=AU_BOUNDARIES,
+    )
+
+REGIONS: Dict[str, Region] = {
+    "au": Region(
+        key="au", name="Australian", country_code=COUNTRY_CODE, country_name="Australia", map_start=MAP_START, bounds=AUS_BOUNDS,
+        output_html=OUTPUT_HTML, snapshot_csv=LATEST_SNAPSHOT_CSV, backup_csv=BACKUP_CSV,
+        boundaries=AU_BOUNDARIES,
+    ),
+    "nz": Region(
+        key="nz", name="New Zealand", country_code="NZ", country_name="New Zealand",
+        map_start={"lat": -41.0, "lon": 173.0, "zoom": 6}, bounds=[[-47.4, 166.3], [-34.3, 178.6]],
+        output_html=Path("outputs/nz/index.html"),
+        snapshot_csv=Path("data/processed/ocm_new_zealand_latest.csv"),
+        backup_csv=Path("data/processed/ocm_new_zealand_backup.csv"),
+        title="New Zealand EV Infrastructure Monitor",
+        subtitle="Mapping the country’s electric vehicle charging network",
+        route_examples=("2 Queen Street, Auckland", "1 Lambton Quay, Wellington"),
+        state_map=NZ_REGION_MAP, order_states=ORDER_NZ_REGIONS,
+    ),
+    "nsw": _state_region("nsw", "New South Wales", -32.5, 147.0, 6, [[-37.6, 140.9], [-28.1, 153.7]]),
+    "vic": _state_region("vic", "Victoria", -37.0, 145.0, 7, [[-39.2, 140.9], [-33.9, 150.0]]),
+    "qld": _state_region("qld", "Queensland", -20.5, 145.5, 5, [[-29.2, 137.9], [-10.0, 153.6]]),
+    "wa": _state_region("wa", "Western Australia", -25.5, 121.5, 5, [[-35.2, 112.9], [-13.6, 129.0]]),
+    "sa": _state_region("sa", "South Australia", -31.5, 135.5, 6, [[-38.1, 129.0], [-25.9, 141.0]]),
+    "tas": _state_region("tas", "Tasmania", -42.0, 146.5, 7, [[-43.7, 143.8], [-39.5, 148.5]]),
+    "act": _state_region("act", "Australian Capital Territory", -35.4, 149.05, 10, [[-35.95, 148.75], [-35.1, 149.4]]),
+    "nt": _state_region("nt", "Northern Territory", -19.5, 133.5, 5, [[-26.0, 129.0], [-10.9, 138.0]]),
+}
+DEFAULT_REGION = "au"
+
+def resolve_regions(spec: str) -> List[Region]:
+    """Parse a comma-separated region list ('au,nz,vic'); 'all' selects every configured region."""
+    keys = list(REGIONS) if spec.strip().lower() == "all" else [k.strip().lower() for k in spec.split(",") if k.strip()]
+    unknown = [k for k in keys if k not in REGIONS]
+    if unknown:
+        raise ValueError(f"Unknown region(s): {', '.join(unknown)} (choose from {', '.join(REGIONS)})")
+    return [REGIONS[k] for k in dict.fromkeys(keys)]
+
 # ============================================================
 # 2) UI helpers
 # ============================================================
 def build_transparent_box(css_id: str, html_inner: str, position: str, offsets=(12,12), width_px=None) -> MacroElement:
+    from branca.element import MacroElement, Template
     x, y = offsets
     if position == "topleft":
         pos_css = f"top: {y}px; left: {x}px;"
@@ -108,6 +308,7 @@ def build_transparent_box(css_id: str, html_inner: str, position: str, offsets=(
     return macro
 
 def inject_label_css(map_obj: Map):
+    from branca.element import MacroElement, Template
     css = f"""
     <style>
       .label-tooltip {{
@@ -142,31 +343,104 @@ function(cluster) {
 # ============================================================
 # 3) Data
 # ============================================================
-def ensure_dirs():
+def ensure_dirs(regions: List[Region] | None = None):
     OUTPUT_HTML.parent.mkdir(parents=True, exist_ok=True)
     BACKUP_CSV.parent.mkdir(parents=True, exist_ok=True)
     LATEST_SNAPSHOT_CSV.parent.mkdir(parents=True, exist_ok=True)
+    for region in regions or []:
+        region.output_html.parent.mkdir(parents=True, exist_ok=True)
+        region.snapshot_csv.parent.mkdir(parents=True, exist_ok=True)
 
 def fetch_ocm_au(api_key: str | None) -> list[dict]:
-    params = {
+    return fetch_ocm(api_key, COUNTRY_CODE)
+
+def ocm_params(country_code: str) -> Dict[str, str]:
+    return {
         "output": "json",
-        "countrycode": "AU",
+        "countrycode": country_code,
         "maxresults": str(MAXRESULTS),
         "include": "connections,operatorinfo,usagetype,statustype"
     }
-    headers = {"X-API-Key": api_key} if api_key else {}
-    print(">> Fetching live data from Open Charge Map...")
-    r = requests.get(OCM_URL, params=params, headers=headers, timeout=HTTP_TIMEOUT)
-    print(">> HTTP", r.status_code)
-    r.raise_for_status()
-    data = r.json()
+
+def ocm_cache_paths(params: Dict[str, str]) -> tuple[Path, Path]:
+    """(body, meta) cache files for a query; the key covers every query parameter but not the API key."""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    stem = f"ocm_{params.get('countrycode', 'xx').lower()}_{digest}"
+    return OCM_CACHE_DIR / f"{stem}.json.gz", OCM_CACHE_DIR / f"{stem}.meta.json"
+
+def decode_ocm_body(body: bytes) -> list[dict]:
+    data = json.loads(gzip.decompress(body))
     if not isinstance(data, list):
         raise RuntimeError("Unexpected OCM response type")
-    print(f">> Received {len(data)} items")
     return data
 
+def replay_ocm_cache(params: Dict[str, str], reason: str) -> list[dict]:
+    body_path, meta_path = ocm_cache_paths(params)
+    if not body_path.exists():
+        raise RuntimeError(f"No cached OCM response for {params.get('countrycode')} at {body_path}")
+    meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+    data = decode_ocm_body(body_path.read_bytes())
+    print(f">> {reason}; replaying cached response from {meta.get('fetched_at', 'unknown time')} ({len(data)} items)")
+    return data
+
+def fetch_ocm(api_key: str | None, country_code: str, offline: bool = False) -> list[dict]:
+    """Fetch POIs with gzip and conditional requests, caching the compressed body on disk.
+    A 304 reply, a failed request or offline=True replays the cached body instead."""
+    params = ocm_params(country_code)
+    if offline:
+        return replay_ocm_cache(params, "Offline mode")
+    body_path, meta_path = ocm_cache_paths(params)
+    meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() and body_path.exists() else {}
+
+    headers = {"Accept-Encoding": "gzip"}
+    if api_key: headers["X-API-Key"] = api_key
+    if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+    print(f">> Fetching live data from Open Charge Map ({country_code})...")
+    try:
+        with requests.get(OCM_URL, params=params, headers=headers, timeout=HTTP_TIMEOUT, stream=True) as r:
+            print(">> HTTP", r.status_code)
+            if r.status_code == 304:
+                return replay_ocm_cache(params, "Not modified since last fetch")
+            r.raise_for_status()
+            # Keep the body exactly as sent when it is gzip'd; compress it ourselves otherwise.
+            if r.headers.get("Content-Encoding", "").lower() == "gzip":
+                body = r.raw.read(decode_content=False)
+            else:
+                body = gzip.compress(r.raw.read(decode_content=True), compresslevel=9, mtime=0)
+            resp_headers = r.headers
+    except Exception as e:
+        if not meta:
+            raise
+        print(f"!! Live fetch failed for {country_code}:", e)
+        return replay_ocm_cache(params, "Falling back to cache")
+
+    data = decode_ocm_body(body)
+    OCM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    body_path.write_bytes(body)
+    meta_path.write_text(json.dumps({
+        "params": params,
+        "etag": resp_headers.get("ETag"),
+        "last_modified": resp_headers.get("Last-Modified"),
+        "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "bytes": len(body),
+    }, indent=2), encoding="utf-8")
+    print(f">> Received {len(data)} items ({len(body) / 1024:,.0f} KB compressed, cached to {body_path})")
+    return data
+
+# OCM CurrentTypeID, used when the nested CurrentType object is absent (compact responses)
+CURRENT_TYPE_IDS = {10: "AC (Single-Phase)", 20: "AC (Three-Phase)", 30: "DC"}
+
+CONNECTION_COLUMNS = ["site_id", "connector", "power_kw", "quantity", "current_type"]
+
 def normalise_ocm(pois: list[dict]) -> pd.DataFrame:
+    return normalise_ocm_tables(pois)[0]
+
+def normalise_ocm_tables(pois: list[dict]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Site table (connections collapsed per site) plus a long connection table keyed by site id."""
+    import pandas as pd
     rows = []
+    conn_cols: Dict[str, list] = {c: [] for c in CONNECTION_COLUMNS}
     for p in pois:
         addr = p.get("AddressInfo") or {}
         conns = p.get("Connections") or []
@@ -196,6 +470,13 @@ def normalise_ocm(pois: list[dict]) -> pd.DataFrame:
             if ct_title:
                 conn_titles.add(ct_title)
 
+            cur = c.get("CurrentType") or {}
+            conn_cols["site_id"].append(p.get("ID"))
+            conn_cols["connector"].append(ct_title.strip() or "Unknown")
+            conn_cols["power_kw"].append(pw)
+            conn_cols["quantity"].append(q)
+            conn_cols["current_type"].append(cur.get("Title") or CURRENT_TYPE_IDS.get(c.get("CurrentTypeID"), "Unknown"))
+
         rows.append({
             "id": p.get("ID"),
             "title": addr.get("Title"),
@@ -215,25 +496,68 @@ def normalise_ocm(pois: list[dict]) -> pd.DataFrame:
         if c in df.columns:
             df[c] = pd.to_numeric(df[c], errors="coerce")
     df = df.dropna(subset=["lat","lon"]).copy()
-    return df
-
-# State normalisation for per-state counts
-STATE_MAP = {
-    "new south wales": "NSW", "nsw": "NSW",
-    "victoria": "VIC", "vic": "VIC",
-    "queensland": "QLD", "qld": "QLD",
-    "south australia": "SA", "sa": "SA",
-    "western australia": "WA", "wa": "WA",
-    "tasmania": "TAS", "tas": "TAS",
-    "northern territory": "NT", "nt": "NT",
-    "australian capital territory": "ACT", "act": "ACT",
-}
-ORDER_STATES = ["NSW","VIC","QLD","WA","SA","TAS","ACT","NT"]
-
-def normalise_state(s: str | None) -> str:
-    if not s: return "UNK"
-    key = str(s).strip().lower()
-    return STATE_MAP.get(key, s.upper() if len(s) <= 4 else "UNK")
+    conns = connection_table(conn_cols)
+    if not df.empty:
+        conns = conns[conns["site_id"].isin(df["id"])].reset_index(drop=True)
+    return df, conns
+
+def connection_table(cols: Dict[str, list] | pd.DataFrame | None = None) -> pd.DataFrame:
+    """Compact dtypes for the connection table: categorical text, float32 kW, int16 ports.
+    A missing or unparsable quantity counts as one port, as in the site table."""
+    import pandas as pd
+    src = pd.DataFrame(cols if cols is not None else {c: [] for c in CONNECTION_COLUMNS})
+    for c in CONNECTION_COLUMNS:
+        if c not in src.columns: src[c] = None
+    qty = pd.to_numeric(src["quantity"], errors="coerce").fillna(1).clip(lower=0, upper=32767)
+    return pd.DataFrame({
+        "site_id": pd.to_numeric(src["site_id"], errors="coerce").fillna(-1).astype("int32"),
+        "connector": src["connector"].fillna("Unknown").astype(str).astype("category"),
+        "power_kw": pd.to_numeric(src["power_kw"], errors="coerce").astype("float32"),
+        "quantity": qty.astype("int16"),
+        "current_type": src["current_type"].fillna("Unknown").astype(str).astype("category"),
+    })
+
+def load_connection_frame(path: Path) -> pd.DataFrame:
+    import pandas as pd
+    return connection_table(pd.read_csv(path))
+
+def connection_ports(conns: pd.DataFrame, sites: pd.DataFrame | None = None, by: str | None = None,
+                     min_kw: float | None = None, connector: str | None = None,
+                     current: str | None = None):
+    """Port counts over the connection table, optionally filtered and grouped by a site column,
+    e.g. CCS ports >= 150 kW per state: connection_ports(conns, sites, "state_abbrev", 150, "CCS")."""
+    mask = conns["quantity"] > 0
+    if min_kw is not None:
+        mask &= conns["power_kw"] >= min_kw
+    if connector is not None:
+        mask &= conns["connector"].astype(str).str.contains(connector, case=False, regex=False)
+    if current is not None:
+        mask &= conns["current_type"].astype(str).str.startswith(current)
+    sel = conns[mask]
+    if by is None:
+        return int(sel["quantity"].sum())
+    keys = sel["site_id"].map(sites.drop_duplicates("id").set_index("id")[by])
+    return sel["quantity"].astype("int64").groupby(keys.to_numpy()).sum().sort_values(ascending=False)
+
+def connector_breakdown(conns: pd.DataFrame) -> pd.DataFrame:
+    """Ports, sites and max kW per connector type, most ports first."""
+    g = conns.groupby("connector", observed=True)
+    out = g.agg(ports=("quantity", "sum"), sites=("site_id", "nunique"), max_kw=("power_kw", "max"))
+    return out.sort_values("ports", ascending=False)
+
+def site_connection_detail(conns: pd.DataFrame):
+    """Per-site text such as 'CCS (Type 2) ×2 @ 50 kW; Type 2 (Socket Only) ×1 @ 22 kW', indexed by site id."""
+    if conns.empty:
+        return conns["site_id"].astype(str).iloc[:0]
+    g = conns.groupby(["site_id", "connector", "power_kw"], observed=True, dropna=False)["quantity"].sum().reset_index()
+    kw = g["power_kw"].round(0).astype("Int64").astype(str)
+    text = g["connector"].astype(str) + " ×" + g["quantity"].astype(str) + (" @ " + kw + " kW").where(g["power_kw"].notna(), "")
+    return text.groupby(g["site_id"].to_numpy()).agg("; ".join)
+
+def normalise_state(s: str | None, state_map: Dict[str, str] | None = None) -> str:
+    if not isinstance(s, str) or not s.strip(): return "UNK"
+    key = s.strip().lower()
+    return (state_map or STATE_MAP).get(key, s.upper() if len(s) <= 4 else "UNK")
 
 def classify_usage_simple(usage: str | None) -> str:
     if not usage: return "unknown"
@@ -251,14 +575,352 @@ def classify_status_simple(status: str | None) -> str:
     if "planned" in s: return "unknown"
     return "unknown"
 
-def enrich_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+def enrich_dataframe(df: pd.DataFrame, region: Region | None = None) -> pd.DataFrame:
+    region = region or REGIONS[DEFAULT_REGION]
     df = df.copy()
     df["usage_simple"] = df["usage_type"].apply(classify_usage_simple)
     df["status_simple"] = df["status"].apply(classify_status_simple)
     df["is_fast"] = df["power_kw"].fillna(0) >= FAST_KW
-    df["state_abbrev"] = df["state"].apply(normalise_state)
+    df["state_abbrev"] = df["state"].apply(lambda v: normalise_state(v, region.state_map))
+    if "area_state" in df.columns:  # polygon state from join_boundaries wins over the free-text field
+        df["state_abbrev"] = df["area_state"].where(df["area_state"].notna(), df["state_abbrev"])
+    return df
+
+def load_snapshot_frame(path: Path, region: Region | None = None) -> pd.DataFrame:
+    """Read a snapshot/backup CSV back into an enriched site frame."""
+    import numpy as np
+    import pandas as pd
+    df = pd.read_csv(path, dtype={f"area_{level}": str for level in AREA_LEVELS})
+    for c in ["power_kw","quantity","usage_type","status","operator","connection_types"]:
+        if c not in df.columns: df[c] = np.nan
+    for c in ["lat","lon","power_kw","quantity"]:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+    df = df.dropna(subset=["lat","lon"]).copy()
+    return enrich_dataframe(df, region)
+
+def canonical_state(abbr: str, order_states: List[str]) -> str:
+    key = str(abbr).strip().upper()
+    if key in order_states:
+        return key
+    return next((a for a in sorted(order_states, key=len, reverse=True) if key.startswith(a)), "UNK")
+
+def merge_state_counts(df: pd.DataFrame, order_states: List[str]) -> Dict[str, int]:
+    """Fold stray abbreviations (e.g. 'WA' with trailing unicode) into known states, the rest into UNK."""
+    merged_counts: Dict[str, int] = {}
+    for k, v in df["state_abbrev"].value_counts().to_dict().items():
+        key = canonical_state(k, order_states)
+        merged_counts[key] = merged_counts.get(key, 0) + int(v)
+    return merged_counts
+
+def region_stats(df: pd.DataFrame, region: Region, conns: pd.DataFrame | None = None) -> Dict[str, Any]:
+    status_counts = df["status_simple"].value_counts(dropna=False).to_dict()
+    usage_counts = df["usage_simple"].value_counts(dropna=False).to_dict()
+    stats = {
+        "region": region.key,
+        "name": region.name,
+        "total_sites": int(len(df)),
+        "fast_sites": int(df["is_fast"].sum()),
+        "status": {k: int(status_counts.get(k, 0)) for k in COL_STATUS},
+        "usage": {k: int(usage_counts.get(k, 0)) for k in ("public", "private", "unknown")},
+        "states": merge_state_counts(df, region.order_states),
+    }
+    if conns is not None and not conns.empty:
+        stats["ports"] = connection_ports(conns)
+        stats["ports_by_connector"] = {str(k): int(v) for k, v in connector_breakdown(conns)["ports"].items()}
+        by_state: Dict[str, int] = {}
+        for k, v in connection_ports(conns, df, "state_abbrev", min_kw=150, current="DC").items():
+            key = canonical_state(k, region.order_states)
+            by_state[key] = by_state.get(key, 0) + int(v)
+        stats["dc_ports_150kw_by_state"] = by_state
+    return stats
+
+# ============================================================
+# 3b) Spatial join (state / LGA / postcode polygons)
+# ============================================================
+@dataclass
+class PolygonIndex:
+    """Polygon edges bucketed on a uniform lon/lat grid for vectorised point-in-polygon tests.
+    Each cell lists the edges that touch it and the features containing its centre. A point's status is
+    the centre's, flipped by every edge crossed on the in-cell path point -> (centre lon, point lat) -> centre,
+    so memory grows with the edges crossing each cell rather than with polygon width."""
+    keys: Any               # area key per feature (object array), written to `area_<level>`
+    names: Any
+    population: Any         # float64 per feature, NaN when unknown
+    anchor: Any             # (n_features, 2): lon, lat of the largest ring's centroid
+    origin: tuple           # (lon, lat) of the grid's SW corner
+    step: tuple             # (dlon, dlat) cell size
+    shape: tuple            # (rows, cols)
+    cell_ptr: Any           # CSR offsets into cell_edges, length rows * cols + 1
+    cell_edges: Any
+    centre_ptr: Any         # CSR offsets into centre_features, length rows * cols + 1
+    centre_features: Any    # features containing each cell centre (even-odd rule)
+    edges: Any              # (n_edges, 4): x0, y0, x1, y1
+    edge_feature: Any
+
+# Indexes built in this process, keyed by boundary file (None when the file is missing or unreadable).
+_BOUNDARY_INDEXES: Dict[Path, Optional[PolygonIndex]] = {}
+
+def _polygon_rings(geometry: Dict[str, Any] | None) -> list:
+    if not geometry: return []
+    if geometry.get("type") == "Polygon": return geometry["coordinates"]
+    if geometry.get("type") == "MultiPolygon": return [ring for poly in geometry["coordinates"] for ring in poly]
+    return []
+
+def read_boundary_features(layer: BoundaryLayer) -> list[dict]:
+    with open(layer.path, encoding="utf-8") as fh:
+        return [f for f in json.load(fh).get("features", []) if _polygon_rings(f.get("geometry"))]
+
+def boundary_key(layer: BoundaryLayer, props: Dict[str, Any], state_map: Dict[str, str] | None = None) -> str:
+    if layer.level == "state":
+        return normalise_state(props.get(layer.name_field), state_map)
+    return str(props.get(layer.code_field, "")).strip()
+
+def _ring_centroid(ring) -> tuple[float, float, float]:
+    """(|area|, lon, lat) of a closed or open ring; vertex mean for degenerate rings."""
+    import numpy as np
+    x, y = ring[:, 0], ring[:, 1]
+    xn, yn = np.roll(x, -1), np.roll(y, -1)
+    cross = x * yn - xn * y
+    a = cross.sum() / 2
+    if abs(a) < 1e-15:
+        return 0.0, float(x.mean()), float(y.mean())
+    return abs(a), float(((x + xn) * cross).sum() / (6 * a)), float(((y + yn) * cross).sum() / (6 * a))
+
+def _ragged(starts, counts):
+    """Concatenated ranges [s, s + n) for each (s, n), plus the owning range of each element."""
+    import numpy as np
+    owner = np.repeat(np.arange(len(counts)), counts)
+    return np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(int(counts.sum())), owner
+
+def build_polygon_index(features: list[dict], layer: BoundaryLayer, state_map: Dict[str, str] | None = None,
+                        grid: int = SPATIAL_GRID_SIZE) -> PolygonIndex:
+    import numpy as np
+    keys, names, pops, bbox, anchor, segs, owner = [], [], [], [], [], [], []
+    for f in features:
+        rings = [np.asarray(r, dtype="float64")[:, :2] for r in _polygon_rings(f.get("geometry")) if len(r) >= 3]
+        if not rings:
+            continue
+        i = len(keys)
+        props = f.get("properties") or {}
+        keys.append(boundary_key(layer, props, state_map))
+        names.append(str(props.get(layer.name_field) or keys[-1]))
+        try: pops.append(float(props.get(layer.population_field)))
+        except (TypeError, ValueError): pops.append(float("nan"))
+        pts = np.concatenate(rings)
+        bbox.append([*pts.min(axis=0), *pts.max(axis=0)])
+        anchor.append(max(_ring_centroid(r) for r in rings)[1:])
+        for ring in rings:
+            segs.append(np.hstack([ring, np.roll(ring, -1, axis=0)]))
+            owner.append(np.full(len(ring), i, dtype="int32"))
+    if not keys:
+        raise ValueError(f"no polygon features in {layer.path}")
+    bbox = np.asarray(bbox)
+    edges, edge_feature = np.concatenate(segs), np.concatenate(owner)
+    keep = (edges[:, 0] != edges[:, 2]) | (edges[:, 1] != edges[:, 3])  # drop ring-closing zero-length edges
+    edges, edge_feature = edges[keep], edge_feature[keep]
+    x0, y0, x1, y1 = edges.T
+
+    lon0, lat0 = bbox[:, 0].min(), bbox[:, 1].min()
+    dlon = max(bbox[:, 2].max() - lon0, 1e-9) / grid
+    dlat = max(bbox[:, 3].max() - lat0, 1e-9) / grid
+    def cell_of(v, v0, d): return np.clip(np.floor((v - v0) / d), 0, grid - 1).astype("int64")
+
+    # Edge -> cells it touches: cells of the edge's bbox whose centre lies within half a cell
+    # diagonal of the edge's line.
+    r_lo, r_hi = cell_of(np.minimum(y0, y1), lat0, dlat), cell_of(np.maximum(y0, y1), lat0, dlat)
+    c_lo, c_hi = cell_of(np.minimum(x0, x1), lon0, dlon), cell_of(np.maximum(x0, x1), lon0, dlon)
+    width = c_hi - c_lo + 1
+    k, eid = _ragged(np.zeros(len(edges), dtype="int64"), (r_hi - r_lo + 1) * width)
+    row, col = r_lo[eid] + k // width[eid], c_lo[eid] + k % width[eid]
+    ex, ey = (x1 - x0) / dlon, (y1 - y0) / dlat  # work in cell units so the tolerance is isotropic
+    cx = (lon0 + (col + 0.5) * dlon - x0[eid]) / dlon
+    cy = (lat0 + (row + 0.5) * dlat - y0[eid]) / dlat
+    near = np.abs(cx * ey[eid] - cy * ex[eid]) <= 0.7072 * np.hypot(ex[eid], ey[eid])
+    cell, eid = (row * grid + col)[near], eid[near]
+    order = np.argsort(cell, kind="stable")
+    cell_ptr = np.zeros(grid * grid + 1, dtype="int64")
+    cell_ptr[1:] = np.cumsum(np.bincount(cell, minlength=grid * grid))
+    cell_edges = eid[order].astype("int32")
+
+    # Cell centres inside each feature: crossings of every row's centre line, paired up per feature.
+    flat = y0 != y1
+    fe = np.flatnonzero(flat)
+    lo = np.clip(np.ceil((np.minimum(y0, y1)[fe] - lat0) / dlat - 0.5), 0, grid).astype("int64")
+    hi = np.clip(np.ceil((np.maximum(y0, y1)[fe] - lat0) / dlat - 0.5), 0, grid).astype("int64")
+    k, j = _ragged(lo, np.maximum(hi - lo, 0))
+    e = fe[j]
+    yc = lat0 + (k + 0.5) * dlat
+    xc = x0[e] + (yc - y0[e]) * (x1[e] - x0[e]) / (y1[e] - y0[e])
+    o = np.lexsort((xc, edge_feature[e], k))
+    k, f, xc = k[o], edge_feature[e][o], xc[o]
+    group = np.r_[True, (k[1:] != k[:-1]) | (f[1:] != f[:-1])] if len(k) else np.zeros(0, bool)
+    rank = np.arange(len(k)) - np.maximum.accumulate(np.where(group, np.arange(len(k)), 0))
+    start = np.flatnonzero(rank % 2 == 0)
+    start = start[start + 1 < len(k)]
+    start = start[(k[start + 1] == k[start]) & (f[start + 1] == f[start])]
+    c0 = np.clip(np.ceil((xc[start] - lon0) / dlon - 0.5), 0, grid).astype("int64")
+    c1 = np.clip(np.ceil((xc[start + 1] - lon0) / dlon - 0.5), 0, grid).astype("int64")
+    cc, j = _ragged(c0, np.maximum(c1 - c0, 0))
+    centre_cell = k[start][j] * grid + cc
+    order = np.argsort(centre_cell, kind="stable")
+    centre_ptr = np.zeros(grid * grid + 1, dtype="int64")
+    centre_ptr[1:] = np.cumsum(np.bincount(centre_cell, minlength=grid * grid))
+    return PolygonIndex(
+        keys=np.asarray(keys, dtype=object), names=np.asarray(names, dtype=object),
+        population=np.asarray(pops, dtype="float64"), anchor=np.asarray(anchor),
+        origin=(lon0, lat0), step=(dlon, dlat), shape=(grid, grid),
+        cell_ptr=cell_ptr, cell_edges=cell_edges,
+        centre_ptr=centre_ptr, centre_features=f[start][j][order].astype("int32"),
+        edges=edges, edge_feature=edge_feature,
+    )
+
+def locate_points(index: PolygonIndex, lon, lat, chunk: int = SPATIAL_JOIN_CHUNK):
+    """Feature number of the polygon containing each point (first one where areas overlap), -1 outside all.
+    (point, edge) pairs of each point's cell are tested in batches of at most `chunk`; crossings on the
+    path to the cell centre are counted per (point, feature) and combined with the centre's status."""
+    import numpy as np
+    lon = np.asarray(lon, dtype="float64")
+    lat = np.asarray(lat, dtype="float64")
+    rows, cols = index.shape
+    out = np.full(len(lon), -1, dtype="int32")
+    col = np.floor((lon - index.origin[0]) / index.step[0])
+    row = np.floor((lat - index.origin[1]) / index.step[1])
+    valid = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)  # also drops NaN coordinates
+    cell = np.where(valid, row * cols + col, 0).astype("int64")
+    ccx = index.origin[0] + (cell % cols + 0.5) * index.step[0]
+    ccy = index.origin[1] + (cell // cols + 0.5) * index.step[1]
+    start = index.cell_ptr[cell]
+    count = np.where(valid, index.cell_ptr[cell + 1] - start, 0)
+    centre_count = np.where(valid, index.centre_ptr[cell + 1] - index.centre_ptr[cell], 0)
+    total = np.cumsum(count)
+    nfeat = len(index.keys)
+
+    lo = 0
+    while lo < len(lon):
+        hi = max(lo + 1, int(np.searchsorted(total, (total[lo - 1] if lo else 0) + chunk, side="right")))
+        idx = np.arange(lo, hi)
+        pos, j = _ragged(start[lo:hi], count[lo:hi])
+        e, pt = index.cell_edges[pos], idx[j]
+        x0, y0, x1, y1 = index.edges[e].T
+        px, py, cx, cy = lon[pt], lat[pt], ccx[pt], ccy[pt]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xi = x0 + (py - y0) * (x1 - x0) / (y1 - y0)   # leg 1: (px, py) -> (cx, py)
+            yi = y0 + (cx - x0) * (y1 - y0) / (x1 - x0)   # leg 2: (cx, py) -> (cx, cy)
+        cross = (((y0 > py) != (y1 > py)) & (xi > np.minimum(px, cx)) & (xi <= np.maximum(px, cx))).astype("int8")
+        cross += ((x0 > cx) != (x1 > cx)) & (yi > np.minimum(py, cy)) & (yi <= np.maximum(py, cy))
+        hit = cross == 1  # an edge crossing both legs cancels out
+        key, n = np.unique(pt[hit] * nfeat + index.edge_feature[e[hit]], return_counts=True)
+        flips = key[n % 2 == 1]
+        c, j = _ragged(index.centre_ptr[cell[lo:hi]], centre_count[lo:hi])
+        centre = idx[j] * nfeat + index.centre_features[c]
+        # inside = centre status XOR odd crossings on the path
+        key, n = np.unique(np.concatenate([flips, centre]), return_counts=True)
+        key = key[n == 1]
+        if len(key):
+            p, f = key // nfeat, key % nfeat
+            lead = np.r_[True, p[1:] != p[:-1]]
+            out[p[lead]] = f[lead]
+        lo = hi
+    return out
+
+def boundary_index(layer: BoundaryLayer, state_map: Dict[str, str] | None = None) -> Optional[PolygonIndex]:
+    """Index for `layer`, built once per process (forked workers inherit it); None without a usable file."""
+    if layer.path not in _BOUNDARY_INDEXES:
+        index = None
+        if not layer.path.exists():
+            print(f"!! No {layer.level} boundaries at {layer.path}; skipping the {layer.level} join.")
+        else:
+            try:
+                t0 = time.perf_counter()
+                index = build_polygon_index(read_boundary_features(layer), layer, state_map)
+                print(f">> Indexed {len(index.keys):,} {layer.level} areas ({len(index.edges):,} edges) "
+                      f"in {time.perf_counter() - t0:.1f}s")
+            except Exception as e:
+                print(f"!! Could not index {layer.path}:", e)
+        _BOUNDARY_INDEXES[layer.path] = index
+    return _BOUNDARY_INDEXES[layer.path]
+
+def join_boundaries(df: pd.DataFrame, region: Region) -> pd.DataFrame:
+    """Add an `area_<level>` column (key of the containing polygon, NaN outside all) for every boundary
+    layer of the region not joined yet. A state layer also replaces the free-text `state_abbrev`."""
+    import numpy as np
+    todo = [layer for layer in region.boundaries if f"area_{layer.level}" not in df.columns]
+    if df.empty or not todo:
+        return df
+    df = df.copy()
+    for layer in todo:
+        index = boundary_index(layer, region.state_map)
+        if index is None:
+            continue
+        t0 = time.perf_counter()
+        hit = locate_points(index, df["lon"].to_numpy(), df["lat"].to_numpy())
+        col = f"area_{layer.level}"
+        df[col] = np.where(hit >= 0, index.keys[hit], None)
+        if layer.level == "state":
+            df["state_abbrev"] = df[col].where(df[col].notna(), df["state_abbrev"])
+        print(f">> Joined {int((hit >= 0).sum()):,} of {len(df):,} sites to {layer.level} areas "
+              f"in {time.perf_counter() - t0:.2f}s")
     return df
 
+def area_table(df: pd.DataFrame, conns: pd.DataFrame | None, layer: BoundaryLayer, index: PolygonIndex,
+               scope=None) -> pd.DataFrame:
+    """Sites, fast sites, ports, installed kW and rates per 100k residents for each area with sites.
+    Features flagged in `scope` are listed even without sites, so coverage gaps show up as zero rows."""
+    import numpy as np
+    import pandas as pd
+    col = f"area_{layer.level}"
+    sites = df[df[col].notna()]
+    keep = np.isin(index.keys, sites[col].unique())
+    if scope is not None:
+        keep |= scope
+    areas = pd.DataFrame({"area": index.keys[keep], "name": index.names[keep], "population": index.population[keep]})
+    areas = areas.groupby("area").agg(name=("name", "first"), population=("population", lambda v: v.sum(min_count=1)))
+
+    g = sites.groupby(col)
+    areas["sites"] = g.size()
+    areas["fast_sites"] = g["is_fast"].sum()
+    if conns is not None and not conns.empty:
+        areas["ports"] = connection_ports(conns, sites, col)
+        sel = conns[conns["quantity"] > 0]
+        kw = (sel["power_kw"].astype("float64") * sel["quantity"]).groupby(sel["site_id"].to_numpy()).sum()
+        site_kw = sites["id"].map(kw)
+    else:
+        areas["ports"] = sites["quantity"].fillna(1).groupby(sites[col].to_numpy()).sum()
+        site_kw = sites["power_kw"] * sites["quantity"].fillna(1)
+    areas["installed_kw"] = site_kw.groupby(sites[col].to_numpy()).sum()
+    for c in ("sites", "fast_sites", "ports"):
+        areas[c] = areas[c].fillna(0).astype("int64")
+    areas["installed_kw"] = areas["installed_kw"].fillna(0.0).round(1)
+    per_100k = 1e5 / areas["population"].where(areas["population"] > 0)
+    areas["sites_per_100k"] = (areas["sites"] * per_100k).round(2)
+    areas["fast_sites_per_100k"] = (areas["fast_sites"] * per_100k).round(2)
+    return areas.reset_index().sort_values(["sites", "area"], ascending=[False, True], ignore_index=True)
+
+def area_scope(layer: BoundaryLayer, index: PolygonIndex, region: Region):
+    """Features of the region's own territory: every feature of the region's boundary files, or, for regions
+    cut to some states, those belonging to one of them (by key for states, else by the state containing the
+    area's anchor). Without a state layer, cut regions list only areas that have sites."""
+    import numpy as np
+    if not region.states:
+        return np.ones(len(index.keys), dtype=bool)
+    if layer.level == "state":
+        return np.isin(index.keys, region.states)
+    state_layer = next((l for l in region.boundaries if l.level == "state"), None)
+    states = boundary_index(state_layer, region.state_map) if state_layer else None
+    if states is None:
+        return np.zeros(len(index.keys), dtype=bool)
+    hit = locate_points(states, index.anchor[:, 0], index.anchor[:, 1])
+    return (hit >= 0) & np.isin(states.keys[np.maximum(hit, 0)], region.states)
+
+def region_area_tables(df: pd.DataFrame, conns: pd.DataFrame | None, region: Region) -> Dict[str, pd.DataFrame]:
+    """One area table per joined boundary level of the region."""
+    tables: Dict[str, pd.DataFrame] = {}
+    for layer in region.boundaries:
+        index = boundary_index(layer, region.state_map)
+        if index is not None and f"area_{layer.level}" in df.columns:
+            tables[layer.level] = area_table(df, conns, layer, index, area_scope(layer, index, region))
+    return tables
+
 # ============================================================
 # 4) Map helpers
 # ============================================================
@@ -270,13 +932,15 @@ def thousands(v) -> str:
         except Exception: return str(v)
 
 def popup_html(row, last_refresh_str: str) -> str:
+    import numpy as np
+    import pandas as pd
     title = row.get("title","") or "Unknown"
     town = row.get("town","") or ""
     state = row.get("state","") or ""
     operator = row.get("operator","") or "Unknown"
     usage = row.get("usage_type","") or "Unknown"
     status = row.get("status","") or "Unknown"
-    conn = row.get("connection_types","") or ""
+    conn = row.get("connection_detail") if isinstance(row.get("connection_detail"), str) else (row.get("connection_types","") or "")
     power_kw = row.get("power_kw", np.nan)
     qty = row.get("quantity", np.nan)
     pwr_txt = f"{power_kw:.0f} kW" if pd.notna(power_kw) else "n/a"
@@ -298,6 +962,8 @@ def status_color(s_simple: str) -> str:
     return COL_STATUS.get(s_simple or "unknown", COL_STATUS["unknown"])
 
 def add_point_marker(lat, lon, color_hex, popup_html_str=None, tooltip=None) -> CircleMarker:
+    import folium
+    from folium import CircleMarker
     cm = CircleMarker(location=(float(lat), float(lon)), radius=5.0, color=color_hex, weight=1.8,
                       fill=True, fill_color=color_hex, fill_opacity=0.75, opacity=1.0)
     if tooltip: folium.Tooltip(tooltip, permanent=False, direction="top", class_name="label-tooltip").add_to(cm)
@@ -310,34 +976,420 @@ def color_dot_hex(hex_color: str) -> str:
 # ============================================================
 # 5) Build map
 # ============================================================
-def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
-    status_counts = df["status_simple"].value_counts(dropna=False).to_dict()
-    tot_sites = len(df)
-    n_oper = int(status_counts.get("operational", 0))
-    n_partial = int(status_counts.get("partial", 0))
-    n_down = int(status_counts.get("down", 0))
-    n_unknown = int(status_counts.get("unknown", 0))
+def route_points_json(df: pd.DataFrame) -> str:
+    """Site array embedded in the page for the route planner (EV_POINTS)."""
+    import pandas as pd
+    points = [{
+        "lat": float(r["lat"]), "lon": float(r["lon"]),
+        "status": str(r.get("status_simple") or "unknown"),
+        "usage": str(r.get("usage_simple") or "unknown"),
+        "fast": bool(r.get("is_fast")),
+        "title": str(r.get("title") or ""),
+        "operator": str(r.get("operator") or ""),
+        "town": str(r.get("town") or ""),
+        "state": str(r.get("state") or ""),
+        "conn": str(r.get("connection_types") or "") if pd.notna(r.get("connection_types")) else "",
+        "power_kw": float(r["power_kw"]) if pd.notna(r.get("power_kw")) else None
+    } for _, r in df.iterrows()]
+    return json.dumps(points)
+
+def _bits_b64(mask) -> str:
+    import numpy as np
+    packed = np.packbits(np.asarray(mask, dtype=bool), bitorder="little")
+    return base64.b64encode(packed.tobytes()).decode("ascii")
+
+def facet_bitsets(df: pd.DataFrame) -> Dict[str, Any]:
+    """Per-facet bitsets over the site array, in EV_POINTS order (bit i = row i, little-endian per byte).
+    The filter panel ORs bitsets within a facet and ANDs across facets."""
+    def group(key, label, masks, mode="any"):
+        values = [{"label": lab, "count": int(mask.sum()), "bits": _bits_b64(mask)} for lab, mask in masks if mask.any()]
+        return {"key": key, "label": label, "mode": mode, "values": values}
+
+    operators = df["operator"].fillna("").astype(str).str.strip().replace("", "(Unknown Operator)")
+    op_counts = operators.value_counts()
+    top_ops = list(op_counts.index[:FACET_MAX_OPERATORS])
+    op_masks = [(op, (operators == op).to_numpy()) for op in top_ops]
+    if len(op_counts) > len(top_ops):
+        op_masks.append(("Other operators", (~operators.isin(top_ops)).to_numpy()))
+
+    dummies = df["connection_types"].fillna("").astype(str).str.get_dummies(sep=", ")
+    conn_masks: Dict[str, Any] = {}
+    for col in dummies.columns:
+        name = col.strip()
+        if name:
+            mask = dummies[col].to_numpy(dtype=bool)
+            conn_masks[name] = conn_masks[name] | mask if name in conn_masks else mask
+    conn_sorted = sorted(conn_masks.items(), key=lambda kv: -int(kv[1].sum()))
+
+    power = df["power_kw"].fillna(0).to_numpy()
+    return {
+        "n": int(len(df)),
+        "groups": [
+            group("operator", "Operator", op_masks),
+            group("connector", "Connector", conn_sorted),
+            group("kw", "Minimum power", [(f"≥ {k} kW", power >= k) for k in FACET_KW_BUCKETS], mode="min"),
+            group("status", "Status", [(s, (df["status_simple"] == s).to_numpy()) for s in COL_STATUS]),
+            group("usage", "Usage", [(u, (df["usage_simple"] == u).to_numpy()) for u in ("public", "private", "unknown")]),
+        ],
+    }
 
-    def pct(n): return f"{(100.0 * n / tot_sites):.0f}%" if tot_sites > 0 else "0%"
+def facet_filter_html(facets: Dict[str, Any]) -> str:
+    def label(g, v):
+        text = f"{html.escape(v['label'])} ({thousands(v['count'])})"
+        if g["key"] == "status":
+            return color_dot_hex(status_color(v["label"])) + text
+        if g["key"] == "usage":
+            return color_dot_hex({"public": COL_PUBLIC, "private": COL_PRIVATE}.get(v["label"], COL_STATUS["unknown"])) + text
+        return text
+
+    parts = []
+    for gi, g in enumerate(facets["groups"]):
+        if not g["values"]:
+            continue
+        parts.append(f'<div style="font-weight:600; margin:6px 0 2px 0;">{g["label"]}</div>')
+        if g["key"] == "operator":
+            opts = "".join(f'<option value="{vi}">{label(g, v)}</option>' for vi, v in enumerate(g["values"]))
+            parts.append(f'<select class="facet-input" data-g="{gi}" multiple size="6" style="width:100%;">{opts}</select>')
+        elif g["mode"] == "min":
+            opts = '<option value="">Any</option>' + "".join(
+                f'<option value="{vi}">{label(g, v)}</option>' for vi, v in enumerate(g["values"]))
+            parts.append(f'<select class="facet-input" data-g="{gi}" style="width:100%;">{opts}</select>')
+        else:
+            parts.append("".join(
+                f'<label style="display:block;"><input type="checkbox" class="facet-input" data-g="{gi}" value="{vi}"> {label(g, v)}</label>'
+                for vi, v in enumerate(g["values"])))
+    return (
+        '<details><summary style="font-size:14px; font-weight:600; cursor:pointer;">Filter chargers</summary>'
+        '<div style="max-height:60vh; overflow-y:auto; margin-top:4px;">'
+        + "".join(parts) +
+        '</div>'
+        '<div style="display:flex; gap:8px; margin-top:8px;"><button id="facet-reset" style="flex:1; padding:4px 8px;">Reset</button></div>'
+        '<div id="facet-msg" style="margin-top:6px; color:#444;"></div>'
+        '</details>'
+    )
 
+def facet_filter_script(facets: Dict[str, Any], map_var: str, cluster_var: str) -> str:
+    """Filter logic: combine bitsets on every change and redraw matches from EV_POINTS into one layer."""
+    return f"""
+    <script>
+    (function() {{
+      const FACETS = {json.dumps(facets)};
+      const STATUS_COLORS = {json.dumps(COL_STATUS)};
+      const NBYTES = Math.ceil(FACETS.n / 8);
+
+      function decode(b64) {{
+        const s = atob(b64);
+        const out = new Uint8Array(NBYTES);
+        for (let i = 0; i < s.length && i < NBYTES; i++) out[i] = s.charCodeAt(i);
+        return out;
+      }}
+      FACETS.groups.forEach(g => g.values.forEach(v => {{ v.bytes = decode(v.bits); }}));
 
-    # Per-state counts
-    state_counts = df["state_abbrev"].value_counts().to_dict()
+      function esc(t) {{ return String(t || '').replace(/[&<>"']/g, c => ({{'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}})[c]); }}
 
-    # Normalise duplicates and unknowns
-    merged_counts = {}
-    for k, v in state_counts.items():
-        key = k.strip().upper()
-        # If it looks like WA‎, wa, or has stray unicode, merge under WA
-        if key.startswith("WA"):
-            key = "WA"
-        elif key not in ORDER_STATES:
-            key = "UNK"
-        merged_counts[key] = merged_counts.get(key, 0) + v
+      function picked(gi) {{
+        const out = [];
+        document.querySelectorAll('.facet-input[data-g="' + gi + '"]').forEach(el => {{
+          if (el.tagName === 'SELECT') {{
+            Array.from(el.selectedOptions).forEach(o => {{ if (o.value !== '') out.push(+o.value); }});
+          }} else if (el.checked) {{
+            out.push(+el.value);
+          }}
+        }});
+        return out;
+      }}
+
+      // OR within a facet, AND across facets; null means no facet is active.
+      function selection() {{
+        let result = null;
+        FACETS.groups.forEach((g, gi) => {{
+          const idx = picked(gi);
+          if (!idx.length) return;
+          const acc = new Uint8Array(NBYTES);
+          idx.forEach(vi => {{ const b = g.values[vi].bytes; for (let i = 0; i < NBYTES; i++) acc[i] |= b[i]; }});
+          if (result === null) {{ result = acc; }}
+          else {{ for (let i = 0; i < NBYTES; i++) result[i] &= acc[i]; }}
+        }});
+        return result;
+      }}
+
+      function popupFor(p) {{
+        const pw = (p.power_kw === null) ? 'n/a' : Math.round(p.power_kw) + ' kW';
+        return '<div style="font-family:{FONT_FAMILY}; font-size:12px;">'
+          + '<div style="font-weight:700; margin-bottom:4px;">' + esc(p.title || 'Unknown') + '</div>'
+          + '<div>' + esc(p.town) + ', ' + esc(p.state) + '</div>'
+          + '<div>Operator: <b>' + esc(p.operator || 'Unknown') + '</b></div>'
+          + '<div>Status: <b>' + esc(p.status) + '</b> · Usage: <b>' + esc(p.usage) + '</b></div>'
+          + (p.conn ? '<div>Connector(s): <b>' + esc(p.conn) + '</b></div>' : '')
+          + '<div>Power: <b>' + pw + '</b></div></div>';
+      }}
+
+      (function waitForMap(n) {{
+        const mapRef = window['{map_var}'];
+        const clusterAll = window['{cluster_var}'];
+        if (!mapRef || !window.EV_POINTS) {{ if (n > 0) setTimeout(() => waitForMap(n - 1), 250); return; }}
+
+        const renderer = L.canvas({{ padding: 0.5 }});
+        const layer = L.markerClusterGroup
+          ? L.markerClusterGroup({{ chunkedLoading: true, iconCreateFunction: {sum_icon_create_function_js().strip()} }})
+          : L.layerGroup();
+        const msg = document.getElementById('facet-msg');
+
+        function apply() {{
+          const t0 = performance.now();
+          const bits = selection();
+          layer.clearLayers();
+          if (bits === null) {{
+            if (mapRef.hasLayer(layer)) mapRef.removeLayer(layer);
+            if (clusterAll && !mapRef.hasLayer(clusterAll)) mapRef.addLayer(clusterAll);
+            if (msg) msg.textContent = '';
+            return;
+          }}
+          const pts = window.EV_POINTS;
+          const markers = [];
+          for (let i = 0; i < NBYTES; i++) {{
+            const b = bits[i];
+            if (!b) continue;
+            for (let k = 0; k < 8; k++) {{
+              if (!(b & (1 << k))) continue;
+              const p = pts[i * 8 + k];
+              if (!p) continue;
+              const c = STATUS_COLORS[p.status] || STATUS_COLORS.unknown;
+              const cm = L.circleMarker([p.lat, p.lon], {{ renderer: renderer, radius: 5, color: c, weight: 1.8, fill: true, fillColor: c, fillOpacity: 0.75 }});
+              cm.bindPopup(() => popupFor(p), {{ maxWidth: 320 }});
+              markers.push(cm);
+            }}
+          }}
+          if (layer.addLayers) layer.addLayers(markers); else markers.forEach(mk => layer.addLayer(mk));
+          if (clusterAll && mapRef.hasLayer(clusterAll)) mapRef.removeLayer(clusterAll);
+          if (!mapRef.hasLayer(layer)) mapRef.addLayer(layer);
+          if (msg) msg.textContent = 'Showing ' + markers.length.toLocaleString() + ' of ' + FACETS.n.toLocaleString()
+            + ' sites (' + Math.round(performance.now() - t0) + ' ms).';
+        }}
+
+        document.querySelectorAll('.facet-input').forEach(el => el.addEventListener('change', apply));
+        const reset = document.getElementById('facet-reset');
+        if (reset) reset.addEventListener('click', function() {{
+          document.querySelectorAll('.facet-input').forEach(el => {{
+            if (el.tagName === 'SELECT') Array.from(el.options).forEach(o => {{ o.selected = false; }});
+            else el.checked = false;
+          }});
+          apply();
+        }});
+      }})(60);
+    }})();
+    </script>
+    """
+
+def _grid_reps(lat, lon, kw, cell_km: float):
+    """Index of the most powerful point in each ~cell_km grid cell."""
+    import numpy as np
+    step = cell_km / 111.0
+    cy = np.floor(lat / step).astype(np.int64)
+    cx = np.floor(lon * np.cos(np.radians(lat)) / step).astype(np.int64)
+    order = np.lexsort((-kw, cx, cy))
+    if not len(order):
+        return order
+    return order[np.r_[True, (np.diff(cy[order]) != 0) | (np.diff(cx[order]) != 0)]]
+
+def planner_nodes(df: pd.DataFrame) -> Dict[str, Any]:
+    """Candidate stops for the route planner: public, non-faulted fast sites, deduplicated to the most
+    powerful site per PLANNER_CELL_KM cell. Node j is EV_POINTS[nodes[j]]; the legs between the nodes in a
+    route's corridor are enumerated per query, so every feasible leg is searched."""
+    import numpy as np
+    ok = (df["is_fast"].to_numpy(dtype=bool)
+          & (df["usage_simple"].to_numpy() != "private") & (df["status_simple"].to_numpy() != "down"))
+    cand = np.flatnonzero(ok)
+    lat = df["lat"].to_numpy(dtype=float)[cand]
+    lon = df["lon"].to_numpy(dtype=float)[cand]
+    kw = np.nan_to_num(df["power_kw"].to_numpy(dtype=float)[cand])
+    nodes = np.sort(cand[_grid_reps(lat, lon, kw, PLANNER_CELL_KM)])
+    return {
+        "n": int(len(nodes)),
+        "nodes": base64.b64encode(nodes.astype("<u4").tobytes()).decode("ascii"),
+        "max_leg_km": PLANNER_MAX_LEG_KM,
+        "corridor_km": PLANNER_CORRIDOR_KM,
+        "reserve": PLANNER_RESERVE,
+    }
+
+def planner_script(planner: Dict[str, Any]) -> str:
+    """window.EV_PLANNER.plan(): corridor stops along the route + a shortest-path pass from origin to destination.
+    Positions are along-route km; a leg from stop a to b costs (s_b - s_a) + off_a + off_b driving km.
+    Stop-to-stop legs are also capped at max_leg_km. corridor() and search() are exposed for check_planner.py."""
+    return f"""
+    <script>
+    (function() {{
+      const G = {json.dumps(planner)};
+
+      function decode(b64, Type) {{
+        const s = atob(b64);
+        const u8 = new Uint8Array(s.length);
+        for (let i = 0; i < s.length; i++) u8[i] = s.charCodeAt(i);
+        return new Type(u8.buffer);
+      }}
+      const NODES = decode(G.nodes, Uint32Array);
+
+      function hav(lat1, lon1, lat2, lon2) {{
+        const r = Math.PI / 180, dLat = (lat2 - lat1) * r, dLon = (lon2 - lon1) * r;
+        const a = Math.sin(dLat / 2) ** 2 + Math.cos(lat1 * r) * Math.cos(lat2 * r) * Math.sin(dLon / 2) ** 2;
+        return 2 * 6371.0 * Math.asin(Math.sqrt(Math.min(1, a)));
+      }}
+
+      // Corridor: nodes meeting minKw within corridor_km of the route, with along-route position s and offset off, sorted by s.
+      function corridor(coords, minKw) {{
+        const cum = new Float64Array(coords.length);
+        let minLat = Infinity, maxLat = -Infinity, minLon = Infinity, maxLon = -Infinity;
+        for (let i = 0; i < coords.length; i++) {{
+          const [lon, lat] = coords[i];
+          if (i) cum[i] = cum[i - 1] + hav(coords[i - 1][1], coords[i - 1][0], lat, lon);
+          minLat = Math.min(minLat, lat); maxLat = Math.max(maxLat, lat); minLon = Math.min(minLon, lon); maxLon = Math.max(maxLon, lon);
+        }}
+        const padLat = G.corridor_km / 111.0, padLon = G.corridor_km / (111.0 * Math.cos((minLat + maxLat) / 2 * Math.PI / 180));
+        const out = [];
+        for (let j = 0; j < G.n; j++) {{
+          const p = window.EV_POINTS[NODES[j]];
+          if (!p || (p.power_kw || 0) < minKw) continue;
+          if (p.lat < minLat - padLat || p.lat > maxLat + padLat || p.lon < minLon - padLon || p.lon > maxLon + padLon) continue;
+          let best = Infinity, bestK = 0;
+          for (let k = 0; k < coords.length; k++) {{
+            const d = hav(p.lat, p.lon, coords[k][1], coords[k][0]);
+            if (d < best) {{ best = d; bestK = k; }}
+          }}
+          if (best > G.corridor_km) continue;
+          out.push({{ node: j, p: p, s: cum[bestK], off: best }});
+        }}
+        out.sort((a, b) => a.s - b.s);
+        return {{ stops: out, total: cum[coords.length - 1] }};
+      }}
+
+      // Shortest path over origin (0), corridor stops (1..m) and destination (m+1). Every leg runs forward along
+      // the route, so one pass in s order is exact; each stop relaxes the window of later stops within reach.
+      function search(cor, usable, mode) {{
+        const hop = Math.min(usable, G.max_leg_km);
+        const st = cor.stops, m = st.length, dest = m + 1;
+        const stopCost = mode === 'detour' ? 0.001 : 1000.0;
+        const dist = new Float64Array(m + 2).fill(Infinity), prev = new Int32Array(m + 2).fill(-1);
+        dist[0] = 0;
+        function relax(u, v, cost) {{ const nd = dist[u] + cost; if (nd < dist[v]) {{ dist[v] = nd; prev[v] = u; }} }}
+        if (cor.total <= usable) relax(0, dest, 0);
+        for (let i = 0; i < m && st[i].s <= usable; i++) {{
+          if (st[i].s + st[i].off <= usable) relax(0, i + 1, stopCost + 2 * st[i].off);
+        }}
+        for (let i = 0; i < m; i++) {{
+          if (!isFinite(dist[i + 1])) continue;
+          const a = st[i];
+          if (cor.total - a.s + a.off <= usable) relax(i + 1, dest, 0);
+          for (let j = i + 1; j < m && st[j].s - a.s + a.off <= hop; j++) {{
+            const b = st[j];
+            if (b.s > a.s && (b.s - a.s) + a.off + b.off <= hop) relax(i + 1, j + 1, stopCost + 2 * b.off);
+          }}
+        }}
+        if (!isFinite(dist[dest])) return null;
+        const path = [];
+        for (let v = prev[dest]; v > 0; v = prev[v]) path.unshift(st[v - 1]);
+        return path;
+      }}
+
+      function esc(t) {{ return String(t || '').replace(/[&<>"']/g, c => ({{'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}})[c]); }}
+
+      window.EV_PLANNER = {{
+        corridor: corridor,
+        search: search,
+        plan: function(coords, totalKm, layer, msg) {{
+          const range = parseFloat((document.getElementById('range-input') || {{}}).value);
+          if (!(range > 0) || !msg) return;
+          const minKw = parseFloat((document.getElementById('minkw-input') || {{}}).value) || 0;
+          const mode = (document.getElementById('plan-mode') || {{}}).value || 'stops';
+          const usable = range * (1 - G.reserve);
+          const t0 = performance.now();
+          const cor = corridor(coords, minKw);
+          const path = search(cor, usable, mode);
+          const ms = Math.round(performance.now() - t0);
+          let html = '<br><b>Charging plan</b> (' + Math.round(range) + ' km range, ' + Math.round(G.reserve * 100) + '% reserve, ≥ ' + minKw + ' kW): ';
+          if (path === null) {{
+            html += '<span style="color:red;">no feasible sequence of stops along this route. Try a lower minimum power.</span>';
+          }} else if (!path.length) {{
+            html += 'no charging stop needed.';
+          }} else {{
+            html += path.length + ' stop(s)<ol style="margin:3px 0 0 0; padding-left:18px;">';
+            path.forEach((st, i) => {{
+              html += '<li>' + esc(st.p.title || 'Charger') + (st.p.town ? ', ' + esc(st.p.town) : '')
+                + ' · ' + Math.round(st.s) + ' km · ' + Math.round(st.p.power_kw || 0) + ' kW</li>';
+              L.marker([st.p.lat, st.p.lon], {{ icon: L.divIcon({{ className: '', iconSize: [20, 20],
+                html: '<div style="width:20px;height:20px;border-radius:50%;background:#2563eb;color:#fff;font:600 11px/20px {FONT_FAMILY};text-align:center;border:1px solid #fff;">' + (i + 1) + '</div>' }}) }})
+                .bindPopup('<b>Stop ' + (i + 1) + '</b><br>' + esc(st.p.title) + '<br>' + esc(st.p.operator)).addTo(layer);
+            }});
+            html += '</ol>';
+          }}
+          msg.innerHTML += html + '<span style="color:#6b7280; font-size:11px;">Planned over ' + cor.stops.length + ' corridor chargers in ' + ms + ' ms.</span>';
+        }}
+      }};
+    }})();
+    </script>
+    """
+
+def _round_coords(coords, ndigits: int):
+    if coords and isinstance(coords[0], list):
+        return [_round_coords(c, ndigits) for c in coords]
+    return [round(v, ndigits) for v in coords]
+
+def choropleth_layer(layer: BoundaryLayer, table: pd.DataFrame, region: Region):
+    """GeoJson overlay shading the areas of `table` in quantile classes of sites per 100k residents
+    (site count when the layer has no population)."""
+    import numpy as np
+    from folium import GeoJson, GeoJsonTooltip
+    metric = "sites_per_100k" if table["sites_per_100k"].notna().any() else "sites"
+    label = "Sites per 100k residents" if metric == "sites_per_100k" else "Charging sites"
+    rows = table.set_index("area")
+    vals = rows[metric].dropna().to_numpy(dtype="float64")
+    breaks = np.unique(np.quantile(vals, np.linspace(0, 1, len(CHOROPLETH_COLORS) + 1)[1:-1])) if len(vals) else np.array([])
+
+    features = []
+    for f in read_boundary_features(layer):
+        key = boundary_key(layer, f.get("properties") or {}, region.state_map)
+        if key not in rows.index:
+            continue
+        row = rows.loc[key]
+        v = row[metric]
+        fill = "#d1d5db" if v != v else CHOROPLETH_COLORS[int(np.searchsorted(breaks, v, side="right"))]
+        geom = f["geometry"]
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": geom["type"], "coordinates": _round_coords(geom["coordinates"], CHOROPLETH_PRECISION)},
+            "properties": {"name": str(row["name"]), "sites": int(row["sites"]),
+                           "value": "n/a" if v != v else f"{v:,.1f}", "fill": fill},
+        })
+    return GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name=f"{label} ({layer.level})", show=False,
+        style_function=lambda feat: {"fillColor": feat["properties"]["fill"], "color": "#475569",
+                                     "weight": 0.5, "fillOpacity": 0.6},
+        tooltip=GeoJsonTooltip(fields=["name", "sites", "value"], aliases=["Area", "Sites", label]),
+    )
+
+def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str, region: Region | None = None,
+              conns: pd.DataFrame | None = None, areas: Dict[str, pd.DataFrame] | None = None):
+    import folium
+    from folium import Map, TileLayer, LayerControl
+    from folium.plugins import MarkerCluster, HeatMap
+    from branca.element import Figure
+    region = region or REGIONS[DEFAULT_REGION]
+    stats = region_stats(df, region, conns)
+    tot_sites = stats["total_sites"]
+    n_oper = stats["status"]["operational"]
+    n_partial = stats["status"]["partial"]
+    n_down = stats["status"]["down"]
+    n_unknown = stats["status"]["unknown"]
+
+    def pct(n): return f"{(100.0 * n / tot_sites):.0f}%" if tot_sites > 0 else "0%"
+
+
+    # Per-state counts, with duplicates and unknowns already normalised
+    merged_counts = stats["states"]
 
     # Build ordered string
     parts = []
-    for abbr in ORDER_STATES:
+    for abbr in region.order_states:
         if abbr in merged_counts:
             parts.append(f"{abbr} <b>{thousands(merged_counts[abbr])}</b>")
     # Add 'UNK' if still present
@@ -346,13 +1398,17 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
 
     by_state_line = " · ".join(parts) if parts else "By state: n/a"
 
-
-    df_public = df[df["usage_simple"] == "public"].copy()
-    df_private = df[df["usage_simple"] == "private"].copy()
-    df_fast = df[df["is_fast"]].copy()
+    # Per-connector port breakdown from the connection table
+    connector_line = ""
+    if stats.get("ports_by_connector"):
+        top = list(stats["ports_by_connector"].items())[:SNAPSHOT_TOP_CONNECTORS]
+        connector_line = "Ports by connector: " + " · ".join(f"{html.escape(k)} <b>{thousands(v)}</b>" for k, v in top)
+        n_hpc = sum(stats["dc_ports_150kw_by_state"].values())
+        connector_line += f"<br>DC ports ≥ 150 kW: <b>{thousands(n_hpc)}</b> of <b>{thousands(stats['ports'])}</b> total ports"
+        df = df.assign(connection_detail=df["id"].map(site_connection_detail(conns)))
 
     fig = Figure(width="100%", height="100%")
-    m = Map(location=(MAP_START["lat"], MAP_START["lon"]), zoom_start=MAP_START["zoom"],
+    m = Map(location=(region.map_start["lat"], region.map_start["lon"]), zoom_start=region.map_start["zoom"],
             tiles=None, control_scale=True, max_bounds=False)
     fig.add_child(m)
 
@@ -368,14 +1424,11 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
 #       m.fit_bounds(AUS_BOUNDS)
 #   except Exception:
 #       pass
+    if region.fit_bounds:
+        m.fit_bounds(region.bounds)
 
     cluster_all = MarkerCluster(name="Charger Clusters", show=True, icon_create_function=sum_icon_create_function_js())
     m.add_child(cluster_all)
-    grp_all_points = FeatureGroup(name="All Chargers (points)", show=False); m.add_child(grp_all_points)
-    grp_public = FeatureGroup(name="Public Only (points)", show=False); m.add_child(grp_public)
-    grp_private = FeatureGroup(name="Private/Restricted (points)", show=False); m.add_child(grp_private)
-    cluster_fast = MarkerCluster(name=f"Fast Chargers ≥ {int(FAST_KW)} kW (clusters)", show=False,
-                                 icon_create_function=sum_icon_create_function_js()); m.add_child(cluster_fast)
 
     if not df.empty:
         heat_pts = df[["lat","lon"]].dropna().values.tolist()
@@ -383,25 +1436,22 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
             HeatMap(heat_pts, radius=18, blur=22, max_zoom=9, min_opacity=0.25,
                     name="Heatmap (all chargers)", show=False).add_to(m)
 
+    # Optional choropleth from the spatial-join area tables
+    if areas and CHOROPLETH_LEVEL in areas:
+        layer = next(l for l in region.boundaries if l.level == CHOROPLETH_LEVEL)
+        choropleth_layer(layer, areas[CHOROPLETH_LEVEL], region).add_to(m)
+
+    # One marker per site; other views come from the filter panel, drawn client-side from EV_POINTS.
     for _, r in df.iterrows():
         col = status_color(r.get("status_simple"))
-        phtml = popup_html(r, last_refresh)
-        add_point_marker(r["lat"], r["lon"], col, popup_html_str=phtml).add_to(cluster_all)
-        add_point_marker(r["lat"], r["lon"], col, popup_html_str=phtml).add_to(grp_all_points)
-
-    for _, r in df_public.iterrows():
-        add_point_marker(r["lat"], r["lon"], COL_PUBLIC, popup_html_str=popup_html(r, last_refresh)).add_to(grp_public)
-    for _, r in df_private.iterrows():
-        add_point_marker(r["lat"], r["lon"], COL_PRIVATE, popup_html_str=popup_html(r, last_refresh)).add_to(grp_private)
-    for _, r in df_fast.iterrows():
-        add_point_marker(r["lat"], r["lon"], COL_FAST, popup_html_str=popup_html(r, last_refresh)).add_to(cluster_fast)
+        add_point_marker(r["lat"], r["lon"], col, popup_html_str=popup_html(r, last_refresh)).add_to(cluster_all)
 
     LayerControl(collapsed=False).add_to(m)
 
     # Title box
     title_html = (
-        f'<div style="color:#111;font-size:20px; font-weight:700; margin-bottom:4px;">{TITLE_PLACEHOLDER}</div>'
-        f'<div style="color:#111;font-size:14px; font-weight:500; margin-bottom:2px;">{SUBTITLE_PLACEHOLDER}</div>'
+        f'<div style="color:#111;font-size:20px; font-weight:700; margin-bottom:4px;">{region.title}</div>'
+        f'<div style="color:#111;font-size:14px; font-weight:500; margin-bottom:2px;">{region.subtitle}</div>'
         f'<div style="color:#111;font-size:12px; font-weight:400;">{THIRD_TITLE_PLACEHOLDER}</div>'
 #       f'<div style="color:#111;font-size:12px; font-weight:400;">AU-wide live snapshot</div>'
     )
@@ -418,6 +1468,7 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
         f'Data source: <b><a href="https://openchargemap.org/" target="_blank">Open Charge Map API</a></b>',
         f"Total sites: <b>{thousands(tot_sites)}</b>",
         f"{by_state_line}",
+        *([connector_line] if connector_line else []),
         f"{dot_g} Operational: <b>{thousands(n_oper)}</b> ({pct(n_oper)})",
         f"{dot_o} Partial: <b>{thousands(n_partial)}</b> ({pct(n_partial)})",
         f"{dot_r} Down: <b>{thousands(n_down)}</b> ({pct(n_down)})",
@@ -427,7 +1478,7 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
     ]
     snapshot_html = (
         '<div style="color:#111; font-weight:600; font-size:12px; margin-bottom:6px;">'
-        'Australian EV charging snapshot</div>'
+        f'{region.name} EV charging snapshot</div>'
         '<ul style="margin:3px 0 0 0; padding-left: 18px;">'
         '<li>' + "</li><li>".join(bullets) + "</li></ul>"
     )
@@ -443,6 +1494,7 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
     "Cluster badge shows the sum of counts inside each cluster at this zoom.",
     "Dots at highest zoom show site-level charging stations.",
     "Popups show values at snapshot time.",
+    "Use Filter chargers to combine operator, connector, minimum power, status and usage.",
     HOWTO_FAST_LINE,
     "Charging station availability reflects current data in OCM API at the time of retrieval.",
     "Charger status and uptime can change – always confirm current availability in your network’s app or live sources.",
@@ -456,35 +1508,30 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
     m.add_child(build_transparent_box("box-howto", howto_html, position="bottomright", offsets=(12,48), width_px=675))
 
     # ---- Route planner UI + JS ----
-    points = [{
-        "lat": float(r["lat"]), "lon": float(r["lon"]),
-        "status": str(r.get("status_simple") or "unknown"),
-        "usage": str(r.get("usage_simple") or "unknown"),
-        "fast": bool(r.get("is_fast")),
-        "title": str(r.get("title") or ""),
-        "operator": str(r.get("operator") or ""),
-        "town": str(r.get("town") or ""),
-        "state": str(r.get("state") or ""),
-        "power_kw": float(r["power_kw"]) if pd.notna(r.get("power_kw")) else None
-    } for _, r in df.iterrows()]
-    js_points = json.dumps(points)
+    js_points = route_points_json(df)
+    planner_kw_options = "".join(f'<option value="{kw}">≥ {kw} kW</option>' for kw in PLANNER_KW_OPTIONS)
 
     panel_html_only = f"""
     <div id="route-search" style="position: fixed; z-index:100001; top: {ROUTE_PANEL_TOP_PX}px; right: {ROUTE_PANEL_RIGHT_PX}px;
       background:RGBA(255,255,255,0.78); padding:10px 12px; border-radius:8px; box-shadow:0 1px 4px rgba(0,0,0,0.2);
       font-family:Inter, Arial, sans-serif; font-size:12px; color:#111; width: 450px;">
       <div style="font-size:14px; font-weight:600; margin-bottom:6px;">Route planner</div>
-               <div style="font-size:11.5px; color:#333; margin-top:6px;"> Use this box to plot a route and highlight chargers within {ROUTE_PROXIMITY_KM:.1f} km.  </div> <br>
+               <div style="font-size:11.5px; color:#333; margin-top:6px;"> Use this box to plot a route and highlight chargers within {ROUTE_PROXIMITY_KM:.1f} km. Enter a vehicle range to plan charging stops.  </div> <br>
       <label>Origin</label>
-      <input id="origin-input" type="text" placeholder="101 Collins Street, Melbourne" list="origin-list" style="width:100%; margin-bottom:6px;" />
+      <input id="origin-input" type="text" placeholder="{region.route_examples[0]}" list="origin-list" style="width:100%; margin-bottom:6px;" />
       <datalist id="origin-list"></datalist>
       <label>Destination</label>
-      <input id="dest-input" type="text" placeholder="601 Hay Street, Perth" list="dest-list" style="width:100%; margin-bottom:6px;" />
+      <input id="dest-input" type="text" placeholder="{region.route_examples[1]}" list="dest-list" style="width:100%; margin-bottom:6px;" />
       <datalist id="dest-list"></datalist>
       <div style="display:flex; gap:8px; margin-top:6px;">
         <button id="btn-find" style="flex:1; padding:6px 8px;">Find Route</button>
         <button id="btn-clear" style="padding:6px 8px;">Clear</button>
       </div>
+      <div style="display:flex; gap:6px; margin-top:4px;">
+        <div style="flex:1;"><label>Range (km)</label><input id="range-input" type="number" min="50" step="10" placeholder="optional" style="width:100%;" /></div>
+        <div style="flex:1;"><label>Min power</label><select id="minkw-input" style="width:100%;">{planner_kw_options}</select></div>
+        <div style="flex:1;"><label>Optimise</label><select id="plan-mode" style="width:100%;"><option value="stops">Fewest stops</option><option value="detour">Least detour</option></select></div>
+      </div>
       <div id="route-msg" style="margin-top:6px; color:#444;"></div>
     </div>
     """.strip()
@@ -495,6 +1542,7 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
     <script>
     (function() {{
       const EV_POINTS = {js_points};
+      window.EV_POINTS = EV_POINTS;
       const PROX_KM = {ROUTE_PROXIMITY_KM:.1f};
       const PANEL_AUTO = {str(ROUTE_PANEL_AUTO).lower()};
 
@@ -559,7 +1607,7 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
         const key = which + '|' + q.trim();
         if (!q || q.length < 3) return [];
         if (geoCache.has(key)) return geoCache.get(key);
-        const url = 'https://nominatim.openstreetmap.org/search?format=jsonv2&countrycodes=au&limit=5&q=' + encodeURIComponent(q);
+        const url = 'https://nominatim.openstreetmap.org/search?format=jsonv2&countrycodes={region.country_code.lower()}&limit=5&q=' + encodeURIComponent(q);
         try {{
           const resp = await fetch(url, {{ headers: {{ 'Accept': 'application/json' }} }});
           if (!resp.ok) throw new Error('HTTP ' + resp.status);
@@ -567,7 +1615,7 @@ def build_map(df: pd.DataFrame, last_refresh: str, next_refresh: str):
 
 const items = data.map(d => {{
     const parts = d.display_name.split(',').map(p => p.trim());
-    const filtered = parts.filter(p => !/Australia/i.test(p) && !/^\d{{4}}$/.test(p));
+    const filtered = parts.filter(p => !/{region.country_name}/i.test(p) && !/^\d{{4}}$/.test(p));
     const label = filtered.slice(0, 3).join(', ');
     return {{
         label: label,
@@ -733,6 +1781,7 @@ if (maxGap > 300 && chargerCoords.length >= 2) {{
              msg.innerHTML += `<br><span style='color:red;'>⚠️Route includes section(s) with limited chargers within ${{PROX_KM.toFixed(1)}} km. <br> ⚠️Route includes a road stretch up to ${{maxGap.toLocaleString(undefined, {{maximumFractionDigits: 0}})}} km without coverage.</span>`;
             }}
           }}
+          if (window.EV_PLANNER) window.EV_PLANNER.plan(coords, totalKm, routeLayer, msg);
         }}
         document.getElementById('btn-find').addEventListener('click', doRoute);
         document.getElementById('btn-clear').addEventListener('click', function() {{
@@ -748,42 +1797,107 @@ if (maxGap > 300 && chargerCoords.length >= 2) {{
     """
     m.get_root().html.add_child(folium.Element(script_html))
 
-    m.save(str(OUTPUT_HTML))
-    print(f">> Map saved to {OUTPUT_HTML.resolve()}")
+    # ---- Faceted filter panel + JS ----
+    facets = facet_bitsets(df)
+    m.add_child(build_transparent_box("box-filter", facet_filter_html(facets), position="topleft",
+                                      offsets=(FILTER_PANEL_LEFT_PX, FILTER_PANEL_TOP_PX), width_px=280))
+    m.get_root().html.add_child(folium.Element(facet_filter_script(facets, m.get_name(), cluster_all.get_name())))
+
+    # ---- Charging-stop planner nodes + JS ----
+    m.get_root().html.add_child(folium.Element(planner_script(planner_nodes(df))))
+
+    m.save(str(region.output_html))
+    print(f">> Map saved to {region.output_html.resolve()}")
        
 # ============================================================
-# 6) Main
+# 5b) Output post-processing
 # ============================================================
-def main():
-    print(">> Australian EV Charging Atlas (v6)")
-    ensure_dirs()
-    load_dotenv()
-    api_key = os.getenv("OCM_API_KEY", "").strip()
-    if api_key: print(">> Using OCM_API_KEY (loaded from .env)")
-    else: print("!! No OCM_API_KEY found. Proceeding without header.")
-
+_SCRIPT_RE = re.compile(r"(<script\b[^>]*>)(.*?)(</script>)", re.S | re.I)
+_STYLE_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style>)", re.S | re.I)
+_HTML_COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.S)
+
+def minify_js(js: str) -> str:
+    """Conservative JS minifier: strips indentation, blank lines and whole-line // comments.
+    Line breaks are kept so automatic semicolon insertion behaves exactly as before."""
+    lines = (ln.strip() for ln in js.splitlines())
+    return "\n".join(ln for ln in lines if ln and not ln.startswith("//"))
+
+def minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+def _minify_markup(markup: str) -> str:
+    markup = _HTML_COMMENT_RE.sub("", markup)
+    markup = re.sub(r"[ \t]*\n\s*", "\n", markup)
+    return re.sub(r"[ \t]{2,}", " ", markup)
+
+def minify_html(markup: str) -> str:
+    """Minify markup, inline <style> blocks and inline <script> blocks separately."""
+    blocks: List[str] = []
+
+    def stash(m, fn):
+        blocks.append(m.group(1) + fn(m.group(2)) + m.group(3))
+        return f"\x00{len(blocks) - 1}\x00"
+
+    markup = _SCRIPT_RE.sub(lambda m: stash(m, minify_js), markup)
+    markup = _STYLE_RE.sub(lambda m: stash(m, minify_css), markup)
+    markup = _minify_markup(markup).strip()
+    return re.sub(r"\x00(\d+)\x00", lambda m: blocks[int(m.group(1))], markup)
+
+def _brotli_compress(data: bytes) -> bytes | None:
     try:
-        data = fetch_ocm_au(api_key)
-        df = normalise_ocm(data)
-        df = enrich_dataframe(df)
-        df.to_csv(LATEST_SNAPSHOT_CSV, index=False)
-        print(f">> Wrote latest snapshot to {LATEST_SNAPSHOT_CSV}")
-    except Exception as e:
-        print("!! Live fetch failed:", e)
-        try:
-            df = pd.read_csv(BACKUP_CSV)
-            for c in ["power_kw","quantity","usage_type","status","operator","connection_types"]:
-                if c not in df.columns: df[c] = np.nan
-            for c in ["lat","lon","power_kw","quantity"]:
-                df[c] = pd.to_numeric(df[c], errors="coerce")
-            df = df.dropna(subset=["lat","lon"]).copy()
-            df = enrich_dataframe(df)
-            print(">> Using backup CSV as data source.")
-        except Exception as e2:
-            print("!! Backup CSV also unavailable:", e2)
-            return
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+def postprocess_outputs(paths: List[Path]) -> List[Dict[str, Any]]:
+    """Minify HTML outputs in place and write precompressed siblings; returns one size row per asset."""
+    report = []
+    for path in paths:
+        if not path.exists():
+            continue
+        raw = path.read_bytes()
+        data = raw
+        if MINIFY_OUTPUTS and path.suffix.lower() in (".html", ".htm"):
+            data = minify_html(raw.decode("utf-8")).encode("utf-8")
+            path.write_bytes(data)
+        row = {"path": str(path), "raw": len(raw), "minified": len(data), "gz": None, "br": None}
+        if PRECOMPRESS_OUTPUTS:
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            path.with_name(path.name + ".gz").write_bytes(gz)
+            row["gz"] = len(gz)
+            br = _brotli_compress(data)
+            if br is not None:
+                path.with_name(path.name + ".br").write_bytes(br)
+                row["br"] = len(br)
+        report.append(row)
+    return report
+
+def print_size_report(report: List[Dict[str, Any]]):
+    def kb(n): return "n/a" if n is None else f"{n / 1024:,.1f} KB"
+    def ratio(n, base): return "" if n is None or not base else f" ({100.0 * n / base:.0f}%)"
+    print(">> Output size report (raw -> minified -> gzip -> brotli):")
+    for row in report:
+        print(f"   {row['path']}: {kb(row['raw'])} -> {kb(row['minified'])}{ratio(row['minified'], row['raw'])}"
+              f" -> {kb(row['gz'])}{ratio(row['gz'], row['raw'])} -> {kb(row['br'])}{ratio(row['br'], row['raw'])}")
+    if PRECOMPRESS_OUTPUTS and report and all(r["br"] is None for r in report):
+        print("!! brotli not installed; skipped .br files.")
+
+# ============================================================
+# 6) Region build driver
+# ============================================================
+@dataclass
+class RegionData:
+    sites: pd.DataFrame
+    connections: pd.DataFrame   # long format, see connection_table()
 
-    # timestamps
+# Source data keyed by region, visible to pool workers (inherited on fork, sent once per worker otherwise).
+_REGION_FRAMES: Dict[str, RegionData] = {}
+
+def refresh_timestamps() -> tuple[str, str]:
     try:
         from zoneinfo import ZoneInfo
         tz = ZoneInfo("Australia/Melbourne")
@@ -792,18 +1906,232 @@ def main():
     now_local = datetime.now(tz)
     last_refresh = now_local.strftime("%d %b %Y %H:%M %Z")
     next_refresh = (now_local + timedelta(hours=24)).strftime("%d %b %Y %H:%M %Z")
+    return last_refresh, next_refresh
 
-    print(">> Building map...")
-    build_map(df, last_refresh, next_refresh)
-    # Ensure Netlify root file timestamp updates
+def source_regions(regions: List[Region]) -> List[Region]:
+    """Top-level regions whose data must be fetched/loaded for `regions`."""
+    return [REGIONS[k] for k in dict.fromkeys(r.source for r in regions)]
+
+def stage_fetch(regions: List[Region], api_key: str | None, offline: bool = False) -> Dict[str, list]:
+    """Fetch (or replay from the cache) the raw OCM payload for each source region."""
+    payloads: Dict[str, list] = {}
+    for source in source_regions(regions):
+        try:
+            payloads[source.key] = fetch_ocm(api_key, source.country_code, offline)
+        except Exception as e:
+            print(f"!! {'Cache replay' if offline else 'Live fetch'} failed for {source.key}:", e)
+    return payloads
+
+def load_region_data(sites_csv: Path, region: Region) -> RegionData:
+    """Site CSV plus its connection table, when one was written next to it."""
+    sites = join_boundaries(load_snapshot_frame(sites_csv, region), region)
+    conns_csv = sites_csv.with_name(sites_csv.stem + "_connections.csv")
+    conns = load_connection_frame(conns_csv) if conns_csv.exists() else connection_table()
+    return RegionData(sites, conns)
+
+def write_region_data(data: RegionData, region: Region):
+    data.sites.to_csv(region.snapshot_csv, index=False)
+    data.connections.to_csv(region.connections_csv, index=False)
+
+def load_backup(region: Region) -> RegionData | None:
+    if region.backup_csv is None or not region.backup_csv.exists():
+        print(f"!! No backup CSV for {region.key}; skipping.")
+        return None
     try:
-        atlas_file = Path("outputs/index.html")
-        os.utime(atlas_file, None)
-        print(f">> Updated timestamp for {atlas_file}")
-    except Exception as e:
-        print("!! Could not update index.html timestamp:", e)
+        data = load_region_data(region.backup_csv, region)
+        print(f">> Using backup CSV as data source for {region.key}.")
+        return data
+    except Exception as e2:
+        print(f"!! Backup CSV also unavailable for {region.key}:", e2)
+        return None
+
+def cut_region_frame(df: pd.DataFrame, region: Region) -> pd.DataFrame:
+    if not region.states:
+        return df
+    parent = REGIONS[region.source]
+    canon = df["state_abbrev"].map(lambda a: canonical_state(a, parent.order_states))
+    return df[canon.isin(region.states)]
+
+def cut_region_data(data: RegionData, region: Region) -> RegionData:
+    if not region.states:
+        return data
+    sites = cut_region_frame(data.sites, region)
+    conns = data.connections[data.connections["site_id"].isin(sites["id"])]
+    return RegionData(sites, conns)
+
+def stage_snapshot(regions: List[Region], payloads: Dict[str, list]) -> Dict[str, RegionData]:
+    """Normalise payloads into site + connection tables and write the latest snapshot CSVs of every region.
+    Source regions without a payload fall back to their backup CSV (no snapshot is written for them)."""
+    ensure_dirs(regions)
+    frames: Dict[str, RegionData] = {}
+    for source in source_regions(regions):
+        if source.key in payloads:
+            sites, conns = normalise_ocm_tables(payloads[source.key])
+            data = RegionData(join_boundaries(enrich_dataframe(sites, source), source), conns)
+            write_region_data(data, source)
+            print(f">> Wrote latest snapshot to {source.snapshot_csv} (+ {len(conns):,} connections)")
+        else:
+            data = load_backup(source)
+        if data is not None:
+            frames[source.key] = data
+    for region in regions:
+        if region.parent and region.source in frames:
+            write_region_data(cut_region_data(frames[region.source], region), region)
+            print(f">> Wrote {region.key} snapshot to {region.snapshot_csv}")
+    return frames
+
+def load_snapshot_frames(regions: List[Region]) -> Dict[str, RegionData]:
+    """Source data for a map-only build: latest snapshot CSVs, else backup CSV."""
+    frames: Dict[str, RegionData] = {}
+    for source in source_regions(regions):
+        data = None
+        if source.snapshot_csv.exists():
+            try:
+                data = load_region_data(source.snapshot_csv, source)
+                print(f">> Loaded snapshot {source.snapshot_csv}")
+            except Exception as e:
+                print(f"!! Could not read snapshot for {source.key}:", e)
+        if data is None:
+            data = load_backup(source)
+        if data is not None:
+            frames[source.key] = data
+    return frames
+
+def _init_region_worker(frames: Dict[str, RegionData]):
+    global _REGION_FRAMES
+    _REGION_FRAMES = frames
+
+def build_region_outputs(key: str, last_refresh: str, next_refresh: str) -> Dict[str, Any]:
+    """Build HTML and stats for one region from the shared source data."""
+    region = REGIONS[key]
+    data = cut_region_data(_REGION_FRAMES[region.source], region)
+    areas = region_area_tables(data.sites, data.connections, region)
+    for level, table in areas.items():
+        table.to_csv(region.area_csv(level), index=False)
+        print(f">> Wrote {region.key} {level} table ({len(table):,} areas) to {region.area_csv(level)}")
+    build_map(data.sites, last_refresh, next_refresh, region, data.connections, areas)
+    stats = region_stats(data.sites, region, data.connections)
+    if areas:
+        stats["areas_with_sites"] = {level: int((t["sites"] > 0).sum()) for level, t in areas.items()}
+    stats["last_refresh"] = last_refresh
+    with open(region.stats_json, "w", encoding="utf-8") as fh:
+        json.dump(stats, fh, indent=2)
+    print(f">> Wrote {region.key} stats to {region.stats_json}")
+    stats["sizes"] = postprocess_outputs([region.output_html, region.stats_json] + [region.area_csv(level) for level in areas])
+    return stats
+
+def stage_build_map(regions: List[Region], frames: Dict[str, RegionData], workers: int | None = None) -> Dict[str, Dict[str, Any]]:
+    """Build every region whose source frame is available, in parallel when workers > 1."""
+    global _REGION_FRAMES
+    ensure_dirs(regions)
+    todo = [r for r in regions if r.source in frames]
+    if not todo:
+        print("!! No region data available.")
+        return {}
+
+    last_refresh, next_refresh = refresh_timestamps()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo)))
+    print(f">> Building {len(todo)} region(s) with {workers} worker(s)...")
+    results: Dict[str, Dict[str, Any]] = {}
+    if workers == 1:
+        _REGION_FRAMES = frames
+        for r in todo:
+            results[r.key] = build_region_outputs(r.key, last_refresh, next_refresh)
+        return results
+
+    if "fork" in mp.get_all_start_methods():
+        _REGION_FRAMES = frames  # inherited copy-on-write by forked workers
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("fork"))
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_region_worker, initargs=(frames,))
+    with pool:
+        futures = {pool.submit(build_region_outputs, r.key, last_refresh, next_refresh): r.key for r in todo}
+        for fut in as_completed(futures):
+            key = futures[fut]
+            try:
+                results[key] = fut.result()
+            except Exception as e:
+                print(f"!! Region {key} failed:", e)
+    return results
 
-    print(">> Done. Upload outputs/index.html to Netlify.")
+def build_regions(regions: List[Region], api_key: str | None, workers: int | None = None,
+                  offline: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Fetch each source region once, snapshot every region, then build all maps."""
+    frames = stage_snapshot(regions, stage_fetch(regions, api_key, offline))
+    return stage_build_map(regions, frames, workers)
+
+# ============================================================
+# 7) Main
+# ============================================================
+COMMANDS = ["fetch", "snapshot", "build-map", "all"]
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    # Subcommands re-declare the common options with SUPPRESS so they don't overwrite top-level values.
+    def add_common(p: argparse.ArgumentParser, suppress: bool):
+        p.add_argument("--regions", default=argparse.SUPPRESS if suppress else DEFAULT_REGION,
+                       help=f"comma-separated region keys or 'all' ({', '.join(REGIONS)}); default: {DEFAULT_REGION}")
+        p.add_argument("--workers", type=int, default=argparse.SUPPRESS if suppress else None,
+                       help="process pool size for map builds (default: CPU count)")
+        p.add_argument("--offline", action="store_true", default=argparse.SUPPRESS if suppress else False,
+                       help="replay cached OCM responses instead of calling the API")
+
+    ap = argparse.ArgumentParser(description="Build EV charging atlas maps from Open Charge Map.")
+    add_common(ap, False)
+    sub = ap.add_subparsers(dest="command", metavar="{" + ",".join(COMMANDS) + "}")
+    helps = {
+        "fetch": "refresh the cached raw OCM responses in data/raw/ (no pandas/folium)",
+        "snapshot": "refresh the latest snapshot CSVs (no folium)",
+        "build-map": "render maps from the latest snapshot CSVs",
+        "all": "fetch, snapshot and build maps (default)",
+    }
+    for name in COMMANDS:
+        p = sub.add_parser(name, help=helps[name])
+        add_common(p, True)
+    args = ap.parse_args(argv)
+    args.command = args.command or "all"
+    return args
+
+def main(argv: List[str] | None = None):
+    print(f">> Australian EV Charging Atlas ({ATLAS_VERSION})")
+    args = parse_args(argv)
+    try:
+        regions = resolve_regions(args.regions)
+    except ValueError as e:
+        print("!!", e)
+        sys.exit(2)
+
+    if args.command == "build-map":
+        results = stage_build_map(regions, load_snapshot_frames(regions), args.workers)
+    else:
+        load_dotenv()
+        api_key = os.getenv("OCM_API_KEY", "").strip()
+        if not args.offline:
+            if api_key: print(">> Using OCM_API_KEY (loaded from .env)")
+            else: print("!! No OCM_API_KEY found. Proceeding without header.")
+        payloads = stage_fetch(regions, api_key, args.offline)
+        if args.command == "fetch":
+            print(f">> Done. Fetched {len(payloads)} payload(s).")
+            return
+        frames = stage_snapshot(regions, payloads)
+        if args.command == "snapshot":
+            print(f">> Done. Snapshots refreshed for {len(frames)} source region(s).")
+            return
+        results = stage_build_map(regions, frames, args.workers)
+
+    if not results:
+        return
+
+    # Ensure Netlify root file timestamp updates
+    for key in results:
+        atlas_file = REGIONS[key].output_html
+        try:
+            os.utime(atlas_file, None)
+            print(f">> Updated timestamp for {atlas_file}")
+        except Exception as e:
+            print(f"!! Could not update {atlas_file} timestamp:", e)
+
+    print_size_report([row for key in results for row in results[key].get("sizes", [])])
+    print(">> Done. Upload outputs/ to Netlify.")
 
 
 """
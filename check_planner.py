@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cross-check for the charging-stop planner.
+Runs the planner JS that build_ev_atlas emits (window.EV_PLANNER) in node on random straight-line routes between
+fast sites, and compares each plan with a brute-force search over every pair of the same corridor stops: the plan
+must be feasible whenever any plan is, every leg must fit the range, and "stops" mode must use the fewest stops.
+Exits non-zero on any mismatch.
+
+Usage:
+    python check_planner.py                                   # backup snapshot
+    python check_planner.py --range 400 --min-kw 50 --routes 200
+    python check_planner.py --synthetic 20000 --min-kw 150
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+import build_ev_atlas as atlas
+
+# ============================================================
+# 1) CONFIGURATION
+# ============================================================
+DEFAULT_ROUTES = 100
+DEFAULT_RANGE_KM = 400.0
+DEFAULT_MIN_KW = 50.0
+ROUTE_KM = (300.0, 1500.0)  # great-circle length of the random routes
+ROUTE_STEP_KM = 2.0  # spacing of the route polyline vertices
+EPS_KM = 1e-6
+
+# ============================================================
+# 2) Inputs
+# ============================================================
+def load_sites(csv_path: Path | None, synthetic: int) -> pd.DataFrame:
+    if synthetic:
+        from synthetic_ocm import generate_pois
+        print(f">> Generating {synthetic:,} synthetic POIs...")
+        return atlas.enrich_dataframe(atlas.normalise_ocm_tables(generate_pois(synthetic))[0])
+    path = csv_path or atlas.BACKUP_CSV
+    print(f">> Loading {path}...")
+    return atlas.load_snapshot_frame(path)
+
+def random_routes(df: pd.DataFrame, n: int, seed: int) -> List[List[List[float]]]:
+    """Straight [lon, lat] polylines between random pairs of fast sites ROUTE_KM apart."""
+    rng = np.random.default_rng(seed)
+    fast = df[df["is_fast"]]
+    lat, lon = fast["lat"].to_numpy(dtype=float), fast["lon"].to_numpy(dtype=float)
+    routes: List[List[List[float]]] = []
+    for _ in range(n * 50):
+        if len(routes) >= n or len(lat) < 2:
+            break
+        i, j = rng.choice(len(lat), 2, replace=False)
+        dy = (lat[j] - lat[i]) * 111.195
+        dx = (lon[j] - lon[i]) * 111.195 * np.cos(np.radians((lat[i] + lat[j]) / 2))
+        km = float(np.hypot(dx, dy))
+        if not ROUTE_KM[0] <= km <= ROUTE_KM[1]:
+            continue
+        t = np.linspace(0.0, 1.0, int(km / ROUTE_STEP_KM) + 2)
+        routes.append(np.round(np.c_[lon[i] + t * (lon[j] - lon[i]), lat[i] + t * (lat[j] - lat[i])], 5).tolist())
+    return routes
+
+# ============================================================
+# 3) Planner under node
+# ============================================================
+def run_planner(df: pd.DataFrame, routes, range_km: float, min_kw: float) -> List[Dict[str, Any]]:
+    """corridor() + search() from the emitted page script, for both plan modes on every route."""
+    script = re.search(r"<script>(.*)</script>", atlas.planner_script(atlas.planner_nodes(df)), re.S).group(1)
+    harness = f"""
+    global.atob = s => Buffer.from(s, 'base64').toString('binary');
+    global.window = {{ EV_POINTS: require(process.argv[2]) }};
+    {script}
+    const P = window.EV_PLANNER, usable = {range_km} * (1 - {atlas.PLANNER_RESERVE});
+    const out = require(process.argv[3]).map(coords => {{
+      const cor = P.corridor(coords, {min_kw});
+      const res = {{ total: cor.total, corridor: cor.stops.map(st => [st.s, st.off]) }};
+      for (const mode of ['stops', 'detour']) {{
+        const path = P.search(cor, usable, mode);
+        res[mode] = path === null ? null : path.map(st => cor.stops.indexOf(st));
+      }}
+      return res;
+    }});
+    process.stdout.write(JSON.stringify(out));
+    """
+    with tempfile.TemporaryDirectory(prefix="ev_atlas_planner_") as tmp:
+        files = {name: Path(tmp) / name for name in ("points.json", "routes.json", "harness.js")}
+        files["points.json"].write_text(atlas.route_points_json(df), encoding="utf-8")
+        files["routes.json"].write_text(json.dumps(routes), encoding="utf-8")
+        files["harness.js"].write_text(harness, encoding="utf-8")
+        proc = subprocess.run(["node", str(files["harness.js"]), str(files["points.json"]), str(files["routes.json"])],
+                              capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"!! node failed:\n{proc.stderr}")
+        sys.exit(2)
+    return json.loads(proc.stdout)
+
+# ============================================================
+# 4) Brute force
+# ============================================================
+def fewest_stops(s, off, total: float, usable: float, hop: float) -> int | None:
+    """Breadth-first search over all stop pairs; None when no plan exists."""
+    if total <= usable + EPS_KM:
+        return 0
+    s, off = np.asarray(s, dtype=float).reshape(-1), np.asarray(off, dtype=float).reshape(-1)
+    reach = (s[None, :] > s[:, None]) & ((s[None, :] - s[:, None]) + off[:, None] + off[None, :] <= hop + EPS_KM)
+    last = total - s + off <= usable + EPS_KM
+    level = s + off <= usable + EPS_KM
+    seen = level.copy()
+    for k in range(1, len(s) + 1):
+        if (level & last).any():
+            return k
+        level = reach[level].any(axis=0) & ~seen
+        if not level.any():
+            return None
+        seen |= level
+    return None
+
+def leg_errors(path: List[int], s, off, total: float, usable: float, hop: float) -> List[str]:
+    """Legs of a returned plan that break the range, reserve or max_leg_km rules."""
+    errors, at, at_off = [], 0.0, 0.0
+    for k, i in enumerate(path):
+        leg = (s[i] - at) + at_off + off[i]
+        if (k and s[i] <= at) or leg > (hop if k else usable) + EPS_KM:
+            errors.append(f"leg {k} to stop at {s[i]:.1f} km is {leg:.1f} km")
+        at, at_off = s[i], off[i]
+    if total - at + at_off > usable + EPS_KM:
+        errors.append(f"final leg is {total - at + at_off:.1f} km")
+    return errors
+
+# ============================================================
+# 5) Main
+# ============================================================
+def main(argv: List[str] | None = None):
+    ap = argparse.ArgumentParser(description="Compare the route planner's plans with a brute-force search.")
+    ap.add_argument("--csv", type=Path, default=None, help=f"sites CSV (default: {atlas.BACKUP_CSV})")
+    ap.add_argument("--synthetic", type=int, default=0, help="use this many synthetic POIs instead of a CSV")
+    ap.add_argument("--routes", type=int, default=DEFAULT_ROUTES)
+    ap.add_argument("--range", type=float, default=DEFAULT_RANGE_KM, dest="range_km", help="vehicle range in km")
+    ap.add_argument("--min-kw", type=float, default=DEFAULT_MIN_KW)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    if not shutil.which("node"):
+        print("!! node is not on PATH; the planner check needs it to run the page script.")
+        sys.exit(2)
+    df = load_sites(args.csv, args.synthetic)
+    routes = random_routes(df, args.routes, args.seed)
+    print(f">> Planning {len(routes)} routes at {args.range_km:.0f} km range, >= {args.min_kw:.0f} kW...")
+    results = run_planner(df, routes, args.range_km, args.min_kw)
+
+    usable = args.range_km * (1 - atlas.PLANNER_RESERVE)
+    hop = min(usable, atlas.PLANNER_MAX_LEG_KM)
+    feasible, failures = 0, 0
+    for r, res in enumerate(results):
+        stops = np.asarray(res["corridor"], dtype=float).reshape(-1, 2)
+        s, off = stops[:, 0], stops[:, 1]
+        best = fewest_stops(s, off, res["total"], usable, hop)
+        feasible += best is not None
+        problems = []
+        for mode in ("stops", "detour"):
+            path = res[mode]
+            if (path is None) != (best is None):
+                problems.append(f"{mode}: planner says {'infeasible' if path is None else 'feasible'}, brute force disagrees")
+                continue
+            if path is not None:
+                problems += [f"{mode}: {e}" for e in leg_errors(path, s, off, res["total"], usable, hop)]
+        if best is not None and res["stops"] is not None and len(res["stops"]) != best:
+            problems.append(f"stops: plan uses {len(res['stops'])} stops, brute force needs {best}")
+        failures += bool(problems)
+        for p in problems:
+            print(f"!! route {r} ({res['total']:.0f} km, {len(s)} corridor stops): {p}")
+
+    print(f">> {len(results)} routes, {feasible} feasible by brute force, {failures} mismatched.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
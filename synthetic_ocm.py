@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic Open Charge Map payload generator.
+Produces POI lists shaped like the OCM /v3/poi response (AddressInfo, Connections, OperatorInfo,
+UsageType, StatusType) so the atlas pipeline can be exercised and benchmarked at any size without
+network access.
+
+Also writes synthetic boundary polygons (GeoJSON, shaped like the ABS LGA layer) for the spatial join.
+
+Usage:
+    python synthetic_ocm.py --n 100000 --out data/bench/ocm_synthetic_100k.json
+    python synthetic_ocm.py --n 100000 --areas 2000
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import argparse
+from pathlib import Path
+from typing import List, Dict, Any
+
+# ============================================================
+# 1) Distributions (rough shape of the Australian OCM listings)
+# ============================================================
+# (weight, centre lat, centre lon, spread deg, state spellings seen in OCM)
+STATE_CENTRES = [
+    (0.30, -33.87, 151.21, 1.6, ["NSW", "New South Wales", "nsw"]),
+    (0.27, -37.81, 144.96, 1.4, ["VIC", "Victoria", "Vic"]),
+    (0.18, -27.47, 153.03, 2.5, ["QLD", "Queensland"]),
+    (0.10, -31.95, 115.86, 2.0, ["WA", "Western Australia", "WA\u200e"]),
+    (0.07, -34.93, 138.60, 1.5, ["SA", "South Australia"]),
+    (0.04, -42.88, 147.33, 0.8, ["TAS", "Tasmania"]),
+    (0.03, -35.28, 149.13, 0.3, ["ACT", "Australian Capital Territory"]),
+    (0.01, -12.46, 130.84, 2.5, ["NT", "Northern Territory"]),
+]
+BLANK_STATE_SHARE = 0.05
+
+TOWNS = ["Sydney", "Melbourne", "Brisbane", "Perth", "Adelaide", "Hobart", "Canberra", "Darwin",
+         "Geelong", "Newcastle", "Wollongong", "Bendigo", "Ballarat", "Townsville", "Cairns",
+         "Toowoomba", "Mildura", "Albury", "Dubbo", "Bunbury", "Launceston", "Mansfield"]
+
+OPERATORS = [
+    (0.22, "(Unknown Operator)"), (0.14, "Chargefox"), (0.10, "Tesla Motors (Worldwide)"),
+    (0.08, "Evie"), (0.07, "NRMA"), (0.06, "ChargePoint"), (0.05, "Ampol AmpCharge"),
+    (0.05, "bp pulse"), (0.05, "Jolt"), (0.04, "EVSE Australia"), (0.04, "Exploren"),
+    (0.03, "RAC WA"), (0.03, "Everty"), (0.02, "Tritium"), (0.02, None),
+]
+
+USAGE_TYPES = [
+    (0.45, "Public"), (0.20, "Public - Membership Required"), (0.12, "Public - Pay At Location"),
+    (0.08, "Private - Restricted Access"), (0.05, "Privately Owned - Notice Required"),
+    (0.10, None),
+]
+
+STATUS_TYPES = [
+    (0.84, "Operational"), (0.03, "Temporarily Unavailable"), (0.02, "Partly Operational (Mixed)"),
+    (0.02, "Not Operational"), (0.02, "Planned For Future Date"), (0.07, None),
+]
+
+# (weight, connection type title, current type title, candidate kW values)
+CONNECTORS = [
+    (0.40, "Type 2 (Socket Only)", "AC (Three-Phase)", [7.0, 11.0, 22.0]),
+    (0.12, "Type 2 (Tethered Connector) ", "AC (Single-Phase)", [7.0, 7.4]),
+    (0.28, "CCS (Type 2)", "DC", [25.0, 50.0, 75.0, 150.0, 250.0, 350.0]),
+    (0.10, "CHAdeMO", "DC", [25.0, 50.0]),
+    (0.05, "Type 1 (J1772)", "AC (Single-Phase)", [3.7, 7.0]),
+    (0.05, "Tesla (Model S/X)", "DC", [120.0, 250.0]),
+]
+MISSING_POWER_SHARE = 0.12
+MISSING_QUANTITY_SHARE = 0.15
+
+# ============================================================
+# 2) Generator
+# ============================================================
+def _pick(rng: random.Random, table):
+    return rng.choices(table, weights=[t[0] for t in table], k=1)[0]
+
+def synthetic_connection(rng: random.Random, conn_id: int) -> Dict[str, Any]:
+    _, ct_title, cur_title, kws = _pick(rng, CONNECTORS)
+    power = None if rng.random() < MISSING_POWER_SHARE else rng.choice(kws)
+    qty = None if rng.random() < MISSING_QUANTITY_SHARE else rng.choice([1, 1, 1, 2, 2, 4, 6])
+    return {
+        "ID": conn_id,
+        "ConnectionType": {"Title": ct_title},
+        "CurrentType": {"Title": cur_title},
+        "PowerKW": power,
+        "Quantity": qty,
+    }
+
+def synthetic_poi(rng: random.Random, poi_id: int) -> Dict[str, Any]:
+    _, lat0, lon0, spread, spellings = _pick(rng, STATE_CENTRES)
+    lat = rng.gauss(lat0, spread / 2.0)
+    lon = rng.gauss(lon0, spread / 2.0)
+    state = None if rng.random() < BLANK_STATE_SHARE else rng.choice(spellings)
+    operator = _pick(rng, OPERATORS)[1]
+    usage = _pick(rng, USAGE_TYPES)[1]
+    status = _pick(rng, STATUS_TYPES)[1]
+    n_conns = rng.choices([0, 1, 2, 3, 4, 6], weights=[0.03, 0.45, 0.30, 0.10, 0.08, 0.04], k=1)[0]
+    town = rng.choice(TOWNS)
+    return {
+        "ID": poi_id,
+        "AddressInfo": {
+            "Title": f"{operator or 'Charger'} {town} #{poi_id}",
+            "Town": town,
+            "StateOrProvince": state,
+            "Latitude": lat,
+            "Longitude": lon,
+        },
+        "Connections": [synthetic_connection(rng, poi_id * 10 + i) for i in range(n_conns)],
+        "OperatorInfo": {"Title": operator} if operator else None,
+        "UsageType": {"Title": usage} if usage else None,
+        "StatusType": {"Title": status} if status else None,
+    }
+
+def generate_pois(n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Deterministic list of `n` synthetic OCM POIs."""
+    rng = random.Random(seed)
+    return [synthetic_poi(rng, 100000 + i) for i in range(n)]
+
+# ============================================================
+# 3) Synthetic boundaries
+# ============================================================
+AU_EXTENT = (112.0, -44.0, 154.0, -10.0)  # lon_min, lat_min, lon_max, lat_max
+
+def _wiggly_edge(rng: random.Random, a, b, vertices: int) -> List[List[float]]:
+    """Polyline a -> b (both ends included) with small perpendicular offsets at interior vertices."""
+    (ax, ay), (bx, by) = a, b
+    pts = [[ax, ay]]
+    for k in range(1, vertices):
+        t = k / vertices
+        off = rng.uniform(-0.08, 0.08)
+        pts.append([ax + t * (bx - ax) - off * (by - ay), ay + t * (by - ay) + off * (bx - ax)])
+    pts.append([bx, by])
+    return pts
+
+def generate_boundaries(n_areas: int, vertices_per_side: int = 16, seed: int = 42,
+                        extent=AU_EXTENT) -> Dict[str, Any]:
+    """GeoJSON FeatureCollection tiling `extent` with about `n_areas` jittered grid cells. Neighbouring
+    cells share their edges exactly, so every point inside the extent falls in exactly one area."""
+    rng = random.Random(seed)
+    side = max(1, round(n_areas ** 0.5))
+    lon0, lat0, lon1, lat1 = extent
+    dx, dy = (lon1 - lon0) / side, (lat1 - lat0) / side
+    corner = {}
+    for i in range(side + 1):
+        for j in range(side + 1):
+            jx = 0.0 if j in (0, side) else rng.uniform(-0.25, 0.25) * dx
+            jy = 0.0 if i in (0, side) else rng.uniform(-0.25, 0.25) * dy
+            corner[i, j] = (lon0 + j * dx + jx, lat0 + i * dy + jy)
+    h = {(i, j): _wiggly_edge(rng, corner[i, j], corner[i, j + 1], vertices_per_side)
+         for i in range(side + 1) for j in range(side)}
+    v = {(i, j): _wiggly_edge(rng, corner[i, j], corner[i + 1, j], vertices_per_side)
+         for i in range(side) for j in range(side + 1)}
+
+    features = []
+    for i in range(side):
+        for j in range(side):
+            # counter-clockwise: bottom, right, top (reversed), left (reversed)
+            ring = h[i, j][:-1] + v[i, j + 1][:-1] + h[i + 1, j][::-1][:-1] + v[i, j][::-1]
+            idx = i * side + j
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": [ring]},
+                "properties": {"LGA_CODE24": str(10000 + idx), "LGA_NAME24": f"Synthetic LGA {idx}",
+                               "population": int(rng.lognormvariate(9.5, 1.3))},
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+# ============================================================
+# 4) Main
+# ============================================================
+def main(argv: List[str] | None = None):
+    ap = argparse.ArgumentParser(description="Write a synthetic Open Charge Map payload to JSON.")
+    ap.add_argument("--n", type=int, default=10000, help="number of POIs (default: 10000)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", type=Path, default=Path("data/bench/ocm_synthetic.json"))
+    ap.add_argument("--areas", type=int, default=0, help="also write about this many boundary polygons")
+    ap.add_argument("--areas-out", type=Path, default=Path("data/bench/boundaries_synthetic.geojson"))
+    args = ap.parse_args(argv)
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    pois = generate_pois(args.n, args.seed)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(pois, fh)
+    print(f">> Wrote {len(pois):,} synthetic POIs to {args.out}")
+    if args.areas > 0:
+        args.areas_out.parent.mkdir(parents=True, exist_ok=True)
+        fc = generate_boundaries(args.areas, seed=args.seed)
+        with open(args.areas_out, "w", encoding="utf-8") as fh:
+            json.dump(fc, fh)
+        print(f">> Wrote {len(fc['features']):,} synthetic boundary polygons to {args.areas_out}")
+
+
+if __name__ == "__main__":
+    main()